@@ -1,35 +1,105 @@
 #!/usr/bin/env python3
-"""Script to check Telegram webhook status."""
-import requests
+"""
+Script to check Telegram webhook status.
+Usage: python scripts/check_webhook.py [TOKEN ...]
+(defaults to TELEGRAM_BOT_TOKEN when no tokens are given)
+"""
+import asyncio
+import json
 import os
 import sys
 from pathlib import Path
+from typing import List
+
+import aiohttp
 
 # Add parent directory to path to import settings
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.app.core.config import settings
 
-TOKEN = settings.telegram_bot_token
+CACHE_DIR = Path(os.path.expanduser("~/.cache/dataentrybot"))
+
+
+def _cache_paths(token: str):
+    """Return ETag and JSON cache paths for a bot (keyed by bot id, not the secret)."""
+    bot_id = token.split(":", 1)[0]
+    return CACHE_DIR / f"webhook_etag_{bot_id}", CACHE_DIR / f"webhook_info_{bot_id}.json"
+
+
+async def get_webhook_info(session: aiohttp.ClientSession, token: str) -> dict:
+    """
+    Get webhook info from Telegram, revalidating with If-None-Match.
+
+    Args:
+        session: Shared aiohttp session
+        token: Telegram bot token
+
+    Returns:
+        getWebhookInfo JSON response
+    """
+    etag_file, info_file = _cache_paths(token)
+    headers = {}
+    if etag_file.exists() and info_file.exists():
+        headers["If-None-Match"] = etag_file.read_text().strip()
+
+    async with session.get(
+        f"https://api.telegram.org/bot{token}/getWebhookInfo",
+        headers=headers
+    ) as response:
+        if response.status == 304:
+            return json.loads(info_file.read_text())
+
+        info = await response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            etag_file.write_text(etag)
+            info_file.write_text(json.dumps(info))
 
-if not TOKEN:
-    print("❌ Error: TELEGRAM_BOT_TOKEN no está configurado")
-    print("   Configura la variable de entorno TELEGRAM_BOT_TOKEN")
-    sys.exit(1)
+        return info
 
-response = requests.get(f"https://api.telegram.org/bot{TOKEN}/getWebhookInfo")
-info = response.json()
 
-if info.get("ok"):
-    result = info["result"]
-    print(f"✅ Webhook configurado:")
-    print(f"   URL: {result['url']}")
-    print(f"   Updates pendientes: {result['pending_update_count']}")
-    if result.get('last_error_message'):
-        print(f"   ⚠️  Último error: {result['last_error_message']}")
-        print(f"   Fecha error: {result.get('last_error_date', 'N/A')}")
+def print_webhook_info(token: str, info):
+    """Print webhook status for one bot."""
+    bot_id = token.split(":", 1)[0]
+
+    if isinstance(info, BaseException):
+        print(f"❌ Bot {bot_id} - Error: {info}")
+        return
+
+    if info.get("ok"):
+        result = info["result"]
+        print(f"✅ Bot {bot_id} - Webhook configurado:")
+        print(f"   URL: {result['url']}")
+        print(f"   Updates pendientes: {result['pending_update_count']}")
+        if result.get('last_error_message'):
+            print(f"   ⚠️  Último error: {result['last_error_message']}")
+            print(f"   Fecha error: {result.get('last_error_date', 'N/A')}")
+        else:
+            print(f"   ✅ Sin errores")
     else:
-        print(f"   ✅ Sin errores")
-else:
-    print(f"❌ Error: {info}")
+        print(f"❌ Bot {bot_id} - Error: {info}")
+
+
+async def main(tokens: List[str]):
+    """Check webhook status for all tokens concurrently."""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+        results = await asyncio.gather(
+            *[get_webhook_info(session, token) for token in tokens],
+            return_exceptions=True
+        )
+
+    for token, info in zip(tokens, results):
+        print_webhook_info(token, info)
+
+
+if __name__ == "__main__":
+    tokens = sys.argv[1:] or ([settings.telegram_bot_token] if settings.telegram_bot_token else [])
+
+    if not tokens:
+        print("❌ Error: TELEGRAM_BOT_TOKEN no está configurado")
+        print("   Configura la variable de entorno TELEGRAM_BOT_TOKEN")
+        sys.exit(1)
 
+    asyncio.run(main(tokens))
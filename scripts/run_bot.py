@@ -5,13 +5,10 @@ Script to run the Telegram bot.
 import asyncio
 import logging
 from src.app.bot.bot import TelegramBot
-from src.app.core.config import settings
+from src.app.core.logging_config import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (records are written by a background thread)
+log_listener = setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +26,17 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # uvloop ships with uvicorn[standard]; fall back to the default loop where it's unavailable
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
 
 
 
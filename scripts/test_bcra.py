@@ -5,8 +5,10 @@ Prueba con CUIT: 30-69163759-6
 """
 import asyncio
 import json
+from dataclasses import asdict
 import logging
 import sys
+import time
 from pathlib import Path
 
 # Agregar el directorio raíz al path para importar módulos
@@ -36,6 +38,15 @@ def print_json(data: dict, indent: int = 2):
     print(json.dumps(data, indent=indent, ensure_ascii=False))
 
 
+async def timed(name: str, coro):
+    """Ejecuta una prueba y reporta su tiempo transcurrido."""
+    t0 = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        print(f"⏱️  {name}: {time.perf_counter() - t0:.3f}s")
+
+
 async def test_cuit_conversion(bcra_client: BCRAClient, cuit: str):
     """Prueba la conversión de CUIT a identificación."""
     print_section("1. PRUEBA: Conversión de CUIT a Identificación")
@@ -198,19 +209,19 @@ async def test_check_credit_status(bcra_client: BCRAClient, cuit: str):
         
         print("✅ Consulta completada")
         print("\n📋 Resultado Consolidado:")
-        print(f"  Estado BCRA: {result.get('estado_bcra', 'N/A')}")
-        print(f"  Cheques Rechazados: {result.get('cheques_rechazados', 0)}")
-        print(f"  Riesgo Crediticio: {result.get('riesgo_crediticio', 'N/A')}")
+        print(f"  Estado BCRA: {result.estado_bcra or 'N/A'}")
+        print(f"  Cheques Rechazados: {result.cheques_rechazados}")
+        print(f"  Riesgo Crediticio: {result.riesgo_crediticio or 'N/A'}")
         
-        if "detalles" in result:
-            detalles = result["detalles"]
+        if result.detalles:
+            detalles = result.detalles
             print(f"\n📊 Detalles:")
             print(f"  - Monto Total: ${detalles.get('monto_total', 0):,.2f}")
             print(f"  - Tiene Deuda Actual: {detalles.get('tiene_deuda_actual', False)}")
             print(f"  - Situaciones: {detalles.get('situaciones', [])}")
         
         print("\n📄 Resultado completo:")
-        print_json(result)
+        print_json(asdict(result))
         
     except Exception as e:
         print(f"❌ Excepción: {str(e)}")
@@ -237,17 +248,14 @@ async def main():
         # 1. Conversión de CUIT
         await test_cuit_conversion(bcra_client, cuit)
         
-        # 2. Consulta de deudas
-        await test_get_deudas(bcra_client, cuit)
-        
-        # 3. Consulta de cheques rechazados
-        await test_get_cheques_rechazados(bcra_client, cuit)
-        
-        # 4. Consulta de deudas históricas
-        await test_get_deudas_historicas(bcra_client, cuit)
+        # 2-4. Consultas por endpoint en paralelo (comparten la sesión del cliente)
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(timed("Deudas", test_get_deudas(bcra_client, cuit)))
+            tg.create_task(timed("Cheques Rechazados", test_get_cheques_rechazados(bcra_client, cuit)))
+            tg.create_task(timed("Deudas Históricas", test_get_deudas_historicas(bcra_client, cuit)))
         
         # 5. Check credit status (método principal)
-        await test_check_credit_status(bcra_client, cuit)
+        await timed("Check Credit Status", test_check_credit_status(bcra_client, cuit))
         
         print_section("✅ TODAS LAS PRUEBAS COMPLETADAS")
         print("Revisa los resultados arriba para verificar el funcionamiento.\n")
@@ -258,6 +266,8 @@ async def main():
         print(f"\n\n❌ Error general: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        await bcra_client.aclose()
 
 
 if __name__ == "__main__":
@@ -1,84 +1,273 @@
 """
 FastAPI routes for the Data Entry Bot API.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request
+from fastapi.responses import ORJSONResponse, Response
+from starlette.formparsers import MultiPartParser
+import asyncio
 import logging
-import io
-import re
-from typing import Optional
+import traceback
+import mmap
+import os
+import orjson
+from typing import List, Optional, Union
+from pydantic import TypeAdapter
+from telegram import Bot, Update
 from telegram.constants import ParseMode
 from src.app.core.models import ChequeData, DocumentData
 from src.app.core.config import settings
 from src.app.services.cheques_processor import ChequesProcessor
 from src.app.services.gemini_client import GeminiClient
-from src.app.utils.file import get_file_mime_type
+from src.app.utils.file import BytesLike, detect_mime_type
+from src.app.bot.messages import (
+    WELCOME_MESSAGE,
+    HELP_MESSAGE,
+    UNKNOWN_MESSAGE,
+    IMAGE_ACK_MESSAGE,
+    IMAGE_ERROR_MESSAGE,
+    PDF_ACK_MESSAGE,
+    PDF_ERROR_MESSAGE,
+    NO_CHEQUE_MESSAGE,
+    CHEQUE_ERROR_MESSAGE,
+    GET_FILE_TIMEOUTS,
+    await_ack,
+    coalesce_messages,
+    format_cheque_message,
+    reply_limited,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize processors
-cheques_processor = ChequesProcessor()
-gemini_client = GeminiClient()
 
+def get_cheques_processor(request: Request) -> ChequesProcessor:
+    """Dependency returning the shared cheques processor (created in the app lifespan)."""
+    return request.app.state.cheques_processor
 
-@router.post("/upload", response_model=dict)
-async def upload_file(file: UploadFile = File(...)):
+
+def get_gemini_client(request: Request) -> GeminiClient:
+    """Dependency returning the shared Gemini client (created in the app lifespan)."""
+    return request.app.state.gemini_client
+
+
+def get_telegram_bot(request: Request) -> Optional[Bot]:
+    """Dependency returning the webhook Bot (None if TELEGRAM_BOT_TOKEN is not set)."""
+    return request.app.state.bot
+
+# Serializes a whole cheque list straight to JSON bytes (no intermediate dicts)
+_CHEQUE_LIST_ADAPTER = TypeAdapter(List[ChequeData])
+
+# Bound once so the webhook hot path skips the class attribute lookup
+_UPDATE_DE_JSON = Update.de_json
+
+# Caps webhook updates processed concurrently in the background
+_DISPATCH_SEMAPHORE = asyncio.Semaphore(settings.webhook_max_concurrency)
+
+# Chunk size for reading uploads (64 KiB)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# In-memory limit of Starlette's upload spool (renamed spool_max_size in newer releases)
+SPOOL_MAX_SIZE = getattr(MultiPartParser, "spool_max_size", None) or MultiPartParser.max_file_size
+
+
+async def _read_upload(file: UploadFile) -> Union[bytearray, mmap.mmap]:
     """
-    Upload and process a file (image, PDF, or cheque).
+    Read an uploaded file in chunks, enforcing the maximum upload size.
     
-    Detects if the file is a cheque and processes it accordingly.
-    Returns structured data extracted from the document.
+    Oversized uploads are rejected as soon as the limit is exceeded,
+    without materializing the whole file in memory. Uploads that Starlette
+    already spooled to disk are memory-mapped instead of copied; the caller
+    must close the returned mmap.
+    
+    Args:
+        file: Uploaded file
+        
+    Returns:
+        File contents (an mmap for uploads spooled to disk)
+        
+    Raises:
+        HTTPException: 413 if the file exceeds settings.max_upload_size
     """
-    try:
-        # Read file data
-        file_data = await file.read()
-        filename = file.filename or "uploaded_file"
-        mime_type = get_file_mime_type(filename)
+    if file.size is not None and file.size > settings.max_upload_size:
+        raise HTTPException(status_code=413, detail="File too large")
+    
+    # Starlette keeps parts up to the spool size in memory and rolls larger
+    # ones over to a temporary file on disk
+    spool = file.file
+    if file.size is not None and file.size > SPOOL_MAX_SIZE:
+        spool.flush()
+        size = os.fstat(spool.fileno()).st_size
+        if size > settings.max_upload_size:
+            raise HTTPException(status_code=413, detail="File too large")
+        if size:
+            return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buffer.extend(chunk)
+        if len(buffer) > settings.max_upload_size:
+            raise HTTPException(status_code=413, detail="File too large")
+    
+    return buffer
+
+
+async def _read_stream(request: Request) -> bytearray:
+    """
+    Read a raw request body from the ASGI stream, enforcing the maximum upload size.
+    
+    Args:
+        request: Incoming request
         
-        logger.info(f"Processing upload: {filename} ({mime_type})")
+    Returns:
+        Body contents
         
-        # Process file directly from memory (no need to save to disk)
-        # This works better in cloud environments like Render where filesystem is ephemeral
+    Raises:
+        HTTPException: 413 if the body exceeds settings.max_upload_size
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.max_upload_size:
+        raise HTTPException(status_code=413, detail="File too large")
+    
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer.extend(chunk)
+        if len(buffer) > settings.max_upload_size:
+            raise HTTPException(status_code=413, detail="File too large")
+    
+    return buffer
+
+
+async def _process_upload(
+    file_data: BytesLike,
+    filename: str,
+    cheques_processor: ChequesProcessor,
+    gemini_client: GeminiClient
+) -> Response:
+    """
+    Detect cheques in an uploaded document, falling back to general extraction.
+    
+    Args:
+        file_data: File contents (bytes-like)
+        filename: Original filename
+        cheques_processor: Shared cheques processor
+        gemini_client: Shared Gemini client
         
-        # Always try to detect cheques first (Gemini will determine if there are any)
-        logger.info("Attempting to detect cheques in document...")
-        cheques_list = await cheques_processor.detect_and_process_cheques(file_data, mime_type, filename)
+    Returns:
+        JSON response with the extracted cheques or document text
         
-        if cheques_list and len(cheques_list) > 0:
-            # Found cheques - return them
-            logger.info(f"Found {len(cheques_list)} cheque(s)")
-            return {
-                "success": True,
-                "tipo_documento": "cheques",
-                "cantidad": len(cheques_list),
-                "data": [cheque.model_dump() for cheque in cheques_list],
-                "filename": filename
-            }
-        else:
-            # Process as general document
-            logger.info("Processing as general document...")
-            result = await gemini_client.process_image(file_data, mime_type)
-            
-            document_data = DocumentData(
-                tipo_documento="documento",
-                contenido=result.get("extracted_text", ""),
-                datos_estructurados={},
-                metadata={
-                    "filename": filename,
-                    "mime_type": mime_type
-                }
-            )
-            
-            return {
-                "success": result.get("success", False),
-                "tipo_documento": "documento",
-                "data": document_data.model_dump(),
-                "filename": filename
+    Raises:
+        HTTPException: 400 for empty files, 415 for unsupported formats
+    """
+    if not file_data:
+        raise HTTPException(status_code=400, detail="Empty file")
+    
+    # Sniff the real format from magic bytes (ignores a wrong extension)
+    # and reject unsupported files before paying for a Gemini call
+    mime_type = detect_mime_type(file_data)
+    if mime_type is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported file type. Send an image (JPG, PNG, GIF, WEBP, BMP) or a PDF."
+        )
+    
+    logger.info("Processing upload: %s (%s)", filename, mime_type)
+    
+    # Process file directly from memory (no need to save to disk)
+    # This works better in cloud environments like Render where filesystem is ephemeral
+    
+    # Always try to detect cheques first (Gemini will determine if there are any)
+    logger.info("Attempting to detect cheques in document...")
+    cheques_list = await cheques_processor.detect_and_process_cheques(file_data, mime_type, filename)
+    
+    if cheques_list and len(cheques_list) > 0:
+        # Found cheques - return them
+        logger.info("Found %d cheque(s)", len(cheques_list))
+        # The cheque list goes straight to JSON bytes via pydantic-core and is
+        # spliced into the envelope, so no per-cheque dicts are built
+        body = b'{"success":true,"tipo_documento":"cheques","cantidad":%d,"data":%b,"filename":%b}' % (
+            len(cheques_list),
+            _CHEQUE_LIST_ADAPTER.dump_json(cheques_list),
+            orjson.dumps(filename)
+        )
+        return Response(content=body, media_type="application/json")
+    else:
+        # Process as general document
+        logger.info("Processing as general document...")
+        result = await gemini_client.process_image(file_data, mime_type)
+        
+        document_data = DocumentData(
+            tipo_documento="documento",
+            contenido=result.get("extracted_text", ""),
+            datos_estructurados={},
+            metadata={
+                "filename": filename,
+                "mime_type": mime_type
             }
-            
+        )
+        
+        return ORJSONResponse({
+            "success": result.get("success", False),
+            "tipo_documento": "documento",
+            "data": document_data.model_dump(),
+            "filename": filename
+        })
+
+
+@router.post("/upload", response_model=dict)
+async def upload_file(
+    file: UploadFile = File(...),
+    cheques_processor: ChequesProcessor = Depends(get_cheques_processor),
+    gemini_client: GeminiClient = Depends(get_gemini_client)
+):
+    """
+    Upload and process a file (image, PDF, or cheque).
+    
+    Detects if the file is a cheque and processes it accordingly.
+    Returns structured data extracted from the document.
+    """
+    file_data = None
+    try:
+        # Read file data (bounded by settings.max_upload_size)
+        file_data = await _read_upload(file)
+        return await _process_upload(
+            file_data,
+            file.filename or "uploaded_file",
+            cheques_processor,
+            gemini_client
+        )
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing upload: {str(e)}")
+        logger.error("Error processing upload: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    finally:
+        # PDF rasterization threads finish before cancellation reaches here,
+        # so nothing still reads the map
+        if isinstance(file_data, mmap.mmap):
+            file_data.close()
+
+
+@router.post("/upload/raw", response_model=dict)
+async def upload_raw(
+    request: Request,
+    filename: str = "uploaded_file",
+    cheques_processor: ChequesProcessor = Depends(get_cheques_processor),
+    gemini_client: GeminiClient = Depends(get_gemini_client)
+):
+    """
+    Upload and process a file sent as the raw request body.
+    
+    The body is read straight from the ASGI stream, skipping multipart parsing
+    and Starlette's spooled temporary file. Same response as /upload.
+    """
+    try:
+        file_data = await _read_stream(request)
+        return await _process_upload(file_data, filename, cheques_processor, gemini_client)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error processing upload: %s", e)
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 
@@ -94,122 +283,60 @@ async def health_check():
     }
 
 
-# Global bot handlers for webhook (lazy initialization)
-_bot_handlers = None
-_bot_lock = None
-
-async def get_bot_handlers():
-    """Get or create bot handlers for webhook (async) - without Application to avoid Updater issues."""
-    global _bot_handlers, _bot_lock
-    if _bot_handlers is None:
-        from telegram import Bot
-        from src.app.services.cheques_processor import ChequesProcessor
-        import asyncio
-        
-        if _bot_lock is None:
-            _bot_lock = asyncio.Lock()
-        
-        async with _bot_lock:
-            if _bot_handlers is None:
-                # Create bot and handlers directly without Application/Updater
-                bot = Bot(token=settings.telegram_bot_token)
-                cheques_processor = ChequesProcessor()
-                
-                _bot_handlers = {
-                    "bot": bot,
-                    "cheques_processor": cheques_processor
-                }
-                logger.info("Bot handlers initialized for webhook")
-    
-    return _bot_handlers
-
-
 @router.post("/webhook")
-async def telegram_webhook(request: dict):
+async def telegram_webhook(
+    request: dict,
+    background_tasks: BackgroundTasks,
+    bot: Optional[Bot] = Depends(get_telegram_bot),
+    cheques_processor: ChequesProcessor = Depends(get_cheques_processor)
+):
     """
     Webhook endpoint for Telegram Bot updates.
     Telegram sends updates as JSON in the request body.
     Process updates directly without Application/Updater to avoid Python 3.13 compatibility issues.
+    
+    The update is acknowledged immediately and processed in a background task,
+    so slow Gemini/BCRA calls don't exceed Telegram's webhook timeout.
     """
     try:
-        from telegram import Update
-        from telegram.constants import ParseMode
-        import io
-        
-        # Get bot handlers
-        handlers = await get_bot_handlers()
-        bot = handlers["bot"]
-        cheques_processor = handlers["cheques_processor"]
+        if bot is None:
+            logger.error("Webhook received but TELEGRAM_BOT_TOKEN is not configured")
+            return {"ok": False, "error": "Bot not configured"}
         
         # Parse update
-        update_obj = Update.de_json(request, bot)
+        update_obj = _UPDATE_DE_JSON(request, bot)
         if not update_obj:
             return {"ok": True}
         
+        background_tasks.add_task(_dispatch_update, bot, update_obj, cheques_processor)
+        
+        return {"ok": True}
+    except Exception as e:
+        logger.error("Error processing webhook: %s", e)
+        logger.error(traceback.format_exc())
+        # Return 200 even on error to avoid Telegram retrying
+        return {"ok": False, "error": str(e)}
+
+
+async def _dispatch_update(bot, update_obj, cheques_processor):
+    """Process a Telegram update after the webhook has been acknowledged."""
+    # Bound how many updates run the Gemini/BCRA pipeline at once
+    async with _DISPATCH_SEMAPHORE:
+        await _handle_update(bot, update_obj, cheques_processor)
+
+
+async def _handle_update(bot, update_obj, cheques_processor):
+    """Route a Telegram update to the matching handler."""
+    try:
         # Process update manually
         if update_obj.message:
             message = update_obj.message
             text = message.text or ""
             
-            # Handle commands
-            if text.startswith("/start"):
-                welcome_message = (
-                    "👋 ¡Hola! Soy tu *Asistente de Cheques*\n\n"
-                    "✨ *¿Qué puedo hacer por ti?*\n"
-                    "📸 Tomo una foto de tu cheque y automáticamente:\n"
-                    "   ✓ Extraigo todos los datos (banco, importe, fechas, etc.)\n"
-                    "   ✓ Valido la información con BCRA\n"
-                    "   ✓ Te muestro todo organizado y fácil de leer\n\n"
-                    "🚀 *¿Cómo empezar?*\n"
-                    "Es súper fácil, solo sigue estos pasos:\n\n"
-                    "1️⃣ Toma una foto clara de tu cheque\n"
-                    "   (o envía un PDF si lo tienes digital)\n"
-                    "2️⃣ Envíamela aquí en el chat\n"
-                    "3️⃣ ¡Listo! Te mostraré toda la información\n\n"
-                    "📱 *Formatos que acepto:*\n"
-                    "• 📷 Fotos (JPG, PNG)\n"
-                    "• 📄 PDFs\n\n"
-                    "💡 *Tip:* Asegúrate de que la foto esté bien iluminada y se vea todo el cheque completo.\n\n"
-                    "¿Listo para probar? ¡Envía tu primer cheque! 📸"
-                )
-                await message.reply_text(welcome_message, parse_mode=ParseMode.MARKDOWN)
-            
-            elif text.startswith("/help"):
-                help_message = (
-                    "📚 *Guía de Uso - Paso a Paso*\n\n"
-                    "🎯 *¿Qué necesitas hacer?*\n"
-                    "Solo enviarme una foto o PDF de un cheque y yo haré el resto.\n\n"
-                    "📝 *Instrucciones detalladas:*\n\n"
-                    "**Paso 1: Prepara tu cheque**\n"
-                    "• Asegúrate de que el cheque esté completo\n"
-                    "• Verifica que se vean todos los datos importantes\n"
-                    "• Si es una foto, que esté bien iluminada\n\n"
-                    "**Paso 2: Envíame la imagen**\n"
-                    "• Toca el ícono de 📎 (clip) en Telegram\n"
-                    "• Selecciona 'Foto' o 'Archivo'\n"
-                    "• Elige tu cheque y envíalo\n\n"
-                    "**Paso 3: Espera el resultado**\n"
-                    "• Te avisaré cuando esté procesando\n"
-                    "• En segundos tendrás toda la información\n"
-                    "• Verás datos del banco, importe, fechas, etc.\n\n"
-                    "📊 *¿Qué información obtendrás?*\n"
-                    "• 🏦 Banco emisor\n"
-                    "• 💰 Importe del cheque\n"
-                    "• 📅 Fechas (emisión y pago)\n"
-                    "• 🔢 Número de cheque\n"
-                    "• 🆔 CUIT del librador\n"
-                    "• 🏛️ Estado BCRA (si está disponible)\n"
-                    "• ⚠️ Alertas de riesgo crediticio\n\n"
-                    "❓ *¿Tienes problemas?*\n"
-                    "• Si no detecta el cheque, verifica que la imagen sea clara\n"
-                    "• Asegúrate de que el cheque esté completo en la foto\n"
-                    "• Intenta con mejor iluminación si es necesario\n\n"
-                    "💬 *Comandos disponibles:*\n"
-                    "• `/start` - Ver mensaje de bienvenida\n"
-                    "• `/help` - Ver esta ayuda\n\n"
-                    "¿Alguna otra duda? ¡Pregúntame! 😊"
-                )
-                await message.reply_text(help_message, parse_mode=ParseMode.MARKDOWN)
+            # Handle commands (dispatch on the command name, ignoring a @botname suffix)
+            command = _COMMANDS.get(text.split(maxsplit=1)[0].partition("@")[0]) if text.startswith("/") else None
+            if command:
+                await command(message)
             
             elif message.photo or (message.document and message.document.mime_type and "image" in message.document.mime_type):
                 # Handle images
@@ -221,192 +348,106 @@ async def telegram_webhook(request: dict):
             
             elif text:
                 # Handle text
-                await message.reply_text(
-                    "👋 ¡Hola!\n\n"
-                    "Para procesar un cheque, necesito que me envíes una *foto* o un *PDF* del cheque.\n\n"
-                    "📸 *¿Cómo hacerlo?*\n"
-                    "1. Toca el ícono de 📎 (clip) en la parte inferior\n"
-                    "2. Selecciona 'Foto' o 'Archivo'\n"
-                    "3. Elige tu cheque y envíalo\n\n"
-                    "💡 *Tip:* Asegúrate de que la foto esté clara y se vea todo el cheque completo.\n\n"
-                    "¿Necesitas más ayuda? Escribe `/help` para ver la guía completa. 😊",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-        
-        return {"ok": True}
+                await message.reply_text(UNKNOWN_MESSAGE, parse_mode=ParseMode.MARKDOWN)
     except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
-        import traceback
+        logger.error("Error processing update: %s", e)
         logger.error(traceback.format_exc())
-        # Return 200 even on error to avoid Telegram retrying
-        return {"ok": False, "error": str(e)}
+
+
+async def _handle_start(message):
+    """Reply to /start with the welcome message."""
+    await message.reply_text(WELCOME_MESSAGE, parse_mode=ParseMode.MARKDOWN)
+
+
+async def _handle_help(message):
+    """Reply to /help with the usage guide."""
+    await message.reply_text(HELP_MESSAGE, parse_mode=ParseMode.MARKDOWN)
+
+
+_COMMANDS = {
+    "/start": _handle_start,
+    "/help": _handle_help,
+}
 
 
 async def _handle_image_webhook(bot, message, cheques_processor):
     """Handle image messages in webhook mode."""
+    # Send the acknowledgment in the background so the download starts right away
+    ack = asyncio.create_task(message.reply_text(IMAGE_ACK_MESSAGE, parse_mode=ParseMode.MARKDOWN))
     try:
-        await message.reply_text(
-            "📸 ¡Perfecto! Recibí tu imagen\n\n"
-            "🔍 Estoy analizando el documento...\n"
-            "⏳ Esto puede tardar unos segundos\n\n"
-            "Por favor espera, estoy trabajando en ello... 💪",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        
         # Get photo file
         if message.photo:
             photo = message.photo[-1]
         else:
             photo = message.document
         
-        file = await bot.get_file(photo.file_id)
+        file = await bot.get_file(photo.file_id, **GET_FILE_TIMEOUTS)
         
-        # Download image
-        image_data = io.BytesIO()
-        await file.download_to_memory(image_data)
-        image_bytes = image_data.getvalue()
+        # Download image straight into a bytearray (no BytesIO + getvalue copy)
+        image_bytes = await file.download_as_bytearray()
         
-        # Process as cheque
-        await _process_cheque_webhook(bot, message, cheques_processor, image_bytes, "image/jpeg")
+        # Process as cheque (sniff the real format; documents may be PNG/WEBP)
+        mime_type = detect_mime_type(image_bytes) or "image/jpeg"
+        await _process_cheque_webhook(bot, message, cheques_processor, image_bytes, mime_type, ack)
     except Exception as e:
-        logger.error(f"Error processing image: {str(e)}")
-        await message.reply_text(
-            "😔 *Ups, algo salió mal*\n\n"
-            "No pude procesar tu imagen en este momento.\n\n"
-            "🔄 *¿Qué puedes hacer?*\n"
-            "• Intenta enviar la imagen nuevamente\n"
-            "• Verifica que la imagen no esté corrupta\n"
-            "• Si el problema persiste, intenta con otra foto\n\n"
-            "Si el error continúa, por favor contacta al soporte.\n\n"
-            "¡Lo siento por las molestias! 😊",
-            parse_mode=ParseMode.MARKDOWN
-        )
+        logger.error("Error processing image: %s", e)
+        await await_ack(ack)
+        await message.reply_text(IMAGE_ERROR_MESSAGE, parse_mode=ParseMode.MARKDOWN)
 
 
 async def _handle_document_webhook(bot, message, cheques_processor):
     """Handle PDF documents in webhook mode."""
+    # Send the acknowledgment in the background so the download starts right away
+    ack = asyncio.create_task(message.reply_text(PDF_ACK_MESSAGE, parse_mode=ParseMode.MARKDOWN))
     try:
-        await message.reply_text(
-            "📄 ¡Excelente! Recibí tu PDF\n\n"
-            "🔍 Estoy analizando el documento...\n"
-            "⏳ Esto puede tardar unos segundos\n\n"
-            "Por favor espera, estoy trabajando en ello... 💪",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        
-        file = await bot.get_file(message.document.file_id)
+        file = await bot.get_file(message.document.file_id, **GET_FILE_TIMEOUTS)
         
-        # Download PDF
-        pdf_data = io.BytesIO()
-        await file.download_to_memory(pdf_data)
-        pdf_bytes = pdf_data.getvalue()
+        # Download PDF straight into a bytearray (no BytesIO + getvalue copy)
+        pdf_bytes = await file.download_as_bytearray()
         
-        await _process_cheque_webhook(bot, message, cheques_processor, pdf_bytes, "application/pdf")
+        await _process_cheque_webhook(bot, message, cheques_processor, pdf_bytes, "application/pdf", ack)
     except Exception as e:
-        logger.error(f"Error processing document: {str(e)}")
-        await message.reply_text(
-            "😔 *Ups, algo salió mal*\n\n"
-            "No pude procesar tu PDF en este momento.\n\n"
-            "🔄 *¿Qué puedes hacer?*\n"
-            "• Intenta enviar el PDF nuevamente\n"
-            "• Verifica que el archivo no esté corrupto\n"
-            "• Si el problema persiste, intenta convertir el PDF a imagen\n\n"
-            "Si el error continúa, por favor contacta al soporte.\n\n"
-            "¡Lo siento por las molestias! 😊",
-            parse_mode=ParseMode.MARKDOWN
-        )
+        logger.error("Error processing document: %s", e)
+        await await_ack(ack)
+        await message.reply_text(PDF_ERROR_MESSAGE, parse_mode=ParseMode.MARKDOWN)
 
 
-async def _process_cheque_webhook(bot, message, cheques_processor, file_data: bytes, mime_type: str):
+async def _process_cheque_webhook(
+    bot,
+    message,
+    cheques_processor,
+    file_data: BytesLike,
+    mime_type: str,
+    ack: Optional[asyncio.Task] = None
+):
     """Process cheque document in webhook mode."""
     try:
         cheques = await cheques_processor.detect_and_process_cheques(file_data, mime_type)
         
+        # The acknowledgment must be delivered before the first result
+        await await_ack(ack)
+        
         if not cheques:
-            await message.reply_text(
-                "😔 *No pude encontrar un cheque en tu imagen*\n\n"
-                "🔍 *¿Qué puede estar pasando?*\n\n"
-                "**Posibles causas:**\n"
-                "• La imagen no es lo suficientemente clara\n"
-                "• El cheque no está completo en la foto\n"
-                "• La iluminación es muy baja o hay sombras\n"
-                "• El documento no es un cheque\n\n"
-                "💡 *Sugerencias para mejorar:*\n"
-                "1. Asegúrate de que el cheque esté completo en la foto\n"
-                "2. Toma la foto con buena iluminación\n"
-                "3. Evita sombras sobre el cheque\n"
-                "4. Verifica que la imagen no esté borrosa\n"
-                "5. Intenta acercarte un poco más al cheque\n\n"
-                "🔄 *¿Qué hacer ahora?*\n"
-                "Puedes intentar enviar otra foto con mejor calidad. ¡Estoy aquí para ayudarte! 😊",
-                parse_mode=ParseMode.MARKDOWN
-            )
+            await message.reply_text(NO_CHEQUE_MESSAGE, parse_mode=ParseMode.MARKDOWN)
             return
         
-        # Send each cheque as formatted message
-        for idx, cheque in enumerate(cheques):
-            message_text = _format_cheque_message(cheque, idx + 1, len(cheques))
-            await message.reply_text(message_text, parse_mode=ParseMode.MARKDOWN)
-    except Exception as e:
-        logger.error(f"Error processing cheque: {str(e)}")
-        await message.reply_text(
-            "😔 *Ups, algo salió mal*\n\n"
-            "Encontré un cheque pero no pude extraer toda la información.\n\n"
-            "🔄 *¿Qué puedes hacer?*\n"
-            "• Intenta enviar otra foto con mejor calidad\n"
-            "• Asegúrate de que el cheque esté completo y claro\n"
-            "• Verifica que la iluminación sea buena\n\n"
-            "Si el problema persiste, por favor contacta al soporte.\n\n"
-            "¡Lo siento por las molestias! 😊",
-            parse_mode=ParseMode.MARKDOWN
+        # Send the cheques as formatted messages (small batches in one message), concurrently
+        texts = coalesce_messages([
+            format_cheque_message(cheque, idx + 1, len(cheques))
+            for idx, cheque in enumerate(cheques)
+        ])
+        results = await asyncio.gather(
+            *[reply_limited(message, text) for text in texts],
+            return_exceptions=True
         )
-
-
-def _format_cheque_message(cheque, index: int, total: int) -> str:
-    """Format cheque data as message."""
-    message = "✅ *¡Listo! Aquí está la información de tu cheque*\n\n"
-    
-    if total > 1:
-        message += f"📋 *Cheque {index} de {total}*\n\n"
-    
-    message += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    message += "📊 *INFORMACIÓN DEL CHEQUE*\n"
-    message += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-    
-    message += f"🏦 *Banco:* {cheque.banco or 'No disponible'}\n"
-    message += f"💰 *Importe:* ${cheque.importe:,.2f}\n"
-    message += f"📅 *Fecha de Emisión:* {cheque.fecha_emision or 'No disponible'}\n"
-    message += f"📅 *Fecha de Pago:* {cheque.fecha_pago or 'No disponible'}\n"
-    message += f"🔢 *Número de Cheque:* {cheque.numero_cheque or 'No disponible'}\n"
-    message += f"🆔 *CUIT del Librador:* {cheque.cuit_librador or 'No disponible'}\n\n"
-    
-    # BCRA Information section
-    has_bcra_info = False
-    bcra_section = "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    bcra_section += "🏛️ *VALIDACIÓN BCRA*\n"
-    bcra_section += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-    
-    if cheque.estado_bcra:
-        bcra_section += f"✅ *Estado:* {cheque.estado_bcra}\n"
-        has_bcra_info = True
-    
-    if cheque.cheques_rechazados > 0:
-        bcra_section += f"⚠️ *Cheques Rechazados:* {cheque.cheques_rechazados}\n"
-        has_bcra_info = True
-    
-    if cheque.riesgo_crediticio:
-        bcra_section += f"📊 *Riesgo Crediticio:* {cheque.riesgo_crediticio}\n"
-        has_bcra_info = True
-    
-    if has_bcra_info:
-        message += bcra_section
-    else:
-        message += "ℹ️ *Nota:* No se pudo obtener información adicional del BCRA en este momento.\n\n"
-    
-    message += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
-    message += "✨ *Procesamiento completado*\n\n"
-    message += "¿Necesitas procesar otro cheque? ¡Solo envíame otra foto! 📸"
-    
-    return message
-
+        errors = [result for result in results if isinstance(result, Exception)]
+        for error in errors:
+            logger.error("Error sending cheque message: %s", error)
+        if errors:
+            # Let the user know some cheques are missing (one error reply below)
+            raise errors[0]
+    except Exception as e:
+        logger.error("Error processing cheque: %s", e)
+        await await_ack(ack)
+        await message.reply_text(CHEQUE_ERROR_MESSAGE, parse_mode=ParseMode.MARKDOWN)
 
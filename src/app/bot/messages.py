@@ -0,0 +1,248 @@
+"""
+User-facing Telegram texts and reply helpers shared by the polling bot and the webhook handlers.
+Texts are built once at import; the Markdown is sent with ParseMode.MARKDOWN.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from telegram.constants import MessageLimit, ParseMode
+from telegram.helpers import escape_markdown
+
+logger = logging.getLogger(__name__)
+
+# Command replies
+WELCOME_MESSAGE = (
+    "👋 ¡Hola! Soy tu *Asistente de Cheques*\n\n"
+    "✨ *¿Qué puedo hacer por ti?*\n"
+    "📸 Tomo una foto de tu cheque y automáticamente:\n"
+    "   ✓ Extraigo todos los datos (banco, importe, fechas, etc.)\n"
+    "   ✓ Valido la información con BCRA\n"
+    "   ✓ Te muestro todo organizado y fácil de leer\n\n"
+    "🚀 *¿Cómo empezar?*\n"
+    "Es súper fácil, solo sigue estos pasos:\n\n"
+    "1️⃣ Toma una foto clara de tu cheque\n"
+    "   (o envía un PDF si lo tienes digital)\n"
+    "2️⃣ Envíamela aquí en el chat\n"
+    "3️⃣ ¡Listo! Te mostraré toda la información\n\n"
+    "📱 *Formatos que acepto:*\n"
+    "• 📷 Fotos (JPG, PNG)\n"
+    "• 📄 PDFs\n\n"
+    "💡 *Tip:* Asegúrate de que la foto esté bien iluminada y se vea todo el cheque completo.\n\n"
+    "¿Listo para probar? ¡Envía tu primer cheque! 📸"
+)
+
+HELP_MESSAGE = (
+    "📚 *Guía de Uso - Paso a Paso*\n\n"
+    "🎯 *¿Qué necesitas hacer?*\n"
+    "Solo enviarme una foto o PDF de un cheque y yo haré el resto.\n\n"
+    "📝 *Instrucciones detalladas:*\n\n"
+    "**Paso 1: Prepara tu cheque**\n"
+    "• Asegúrate de que el cheque esté completo\n"
+    "• Verifica que se vean todos los datos importantes\n"
+    "• Si es una foto, que esté bien iluminada\n\n"
+    "**Paso 2: Envíame la imagen**\n"
+    "• Toca el ícono de 📎 (clip) en Telegram\n"
+    "• Selecciona 'Foto' o 'Archivo'\n"
+    "• Elige tu cheque y envíalo\n\n"
+    "**Paso 3: Espera el resultado**\n"
+    "• Te avisaré cuando esté procesando\n"
+    "• En segundos tendrás toda la información\n"
+    "• Verás datos del banco, importe, fechas, etc.\n\n"
+    "📊 *¿Qué información obtendrás?*\n"
+    "• 🏦 Banco emisor\n"
+    "• 💰 Importe del cheque\n"
+    "• 📅 Fechas (emisión y pago)\n"
+    "• 🔢 Número de cheque\n"
+    "• 🆔 CUIT del librador\n"
+    "• 🏛️ Estado BCRA (si está disponible)\n"
+    "• ⚠️ Alertas de riesgo crediticio\n\n"
+    "❓ *¿Tienes problemas?*\n"
+    "• Si no detecta el cheque, verifica que la imagen sea clara\n"
+    "• Asegúrate de que el cheque esté completo en la foto\n"
+    "• Intenta con mejor iluminación si es necesario\n\n"
+    "💬 *Comandos disponibles:*\n"
+    "• `/start` - Ver mensaje de bienvenida\n"
+    "• `/help` - Ver esta ayuda\n\n"
+    "¿Alguna otra duda? ¡Pregúntame! 😊"
+)
+
+UNKNOWN_MESSAGE = (
+    "👋 ¡Hola!\n\n"
+    "Para procesar un cheque, necesito que me envíes una *foto* o un *PDF* del cheque.\n\n"
+    "📸 *¿Cómo hacerlo?*\n"
+    "1. Toca el ícono de 📎 (clip) en la parte inferior\n"
+    "2. Selecciona 'Foto' o 'Archivo'\n"
+    "3. Elige tu cheque y envíalo\n\n"
+    "💡 *Tip:* Asegúrate de que la foto esté clara y se vea todo el cheque completo.\n\n"
+    "¿Necesitas más ayuda? Escribe `/help` para ver la guía completa. 😊"
+)
+
+# Acknowledgments and error replies
+IMAGE_ACK_MESSAGE = (
+    "📸 ¡Perfecto! Recibí tu imagen\n\n"
+    "🔍 Estoy analizando el documento...\n"
+    "⏳ Esto puede tardar unos segundos\n\n"
+    "Por favor espera, estoy trabajando en ello... 💪"
+)
+
+IMAGE_ERROR_MESSAGE = (
+    "😔 *Ups, algo salió mal*\n\n"
+    "No pude procesar tu imagen en este momento.\n\n"
+    "🔄 *¿Qué puedes hacer?*\n"
+    "• Intenta enviar la imagen nuevamente\n"
+    "• Verifica que la imagen no esté corrupta\n"
+    "• Si el problema persiste, intenta con otra foto\n\n"
+    "Si el error continúa, por favor contacta al soporte.\n\n"
+    "¡Lo siento por las molestias! 😊"
+)
+
+PDF_ACK_MESSAGE = (
+    "📄 ¡Excelente! Recibí tu PDF\n\n"
+    "🔍 Estoy analizando el documento...\n"
+    "⏳ Esto puede tardar unos segundos\n\n"
+    "Por favor espera, estoy trabajando en ello... 💪"
+)
+
+PDF_ERROR_MESSAGE = (
+    "😔 *Ups, algo salió mal*\n\n"
+    "No pude procesar tu PDF en este momento.\n\n"
+    "🔄 *¿Qué puedes hacer?*\n"
+    "• Intenta enviar el PDF nuevamente\n"
+    "• Verifica que el archivo no esté corrupto\n"
+    "• Si el problema persiste, intenta convertir el PDF a imagen\n\n"
+    "Si el error continúa, por favor contacta al soporte.\n\n"
+    "¡Lo siento por las molestias! 😊"
+)
+
+NO_CHEQUE_MESSAGE = (
+    "😔 *No pude encontrar un cheque en tu imagen*\n\n"
+    "🔍 *¿Qué puede estar pasando?*\n\n"
+    "**Posibles causas:**\n"
+    "• La imagen no es lo suficientemente clara\n"
+    "• El cheque no está completo en la foto\n"
+    "• La iluminación es muy baja o hay sombras\n"
+    "• El documento no es un cheque\n\n"
+    "💡 *Sugerencias para mejorar:*\n"
+    "1. Asegúrate de que el cheque esté completo en la foto\n"
+    "2. Toma la foto con buena iluminación\n"
+    "3. Evita sombras sobre el cheque\n"
+    "4. Verifica que la imagen no esté borrosa\n"
+    "5. Intenta acercarte un poco más al cheque\n\n"
+    "🔄 *¿Qué hacer ahora?*\n"
+    "Puedes intentar enviar otra foto con mejor calidad. ¡Estoy aquí para ayudarte! 😊"
+)
+
+CHEQUE_ERROR_MESSAGE = (
+    "😔 *Ups, algo salió mal*\n\n"
+    "Encontré un cheque pero no pude extraer toda la información.\n\n"
+    "🔄 *¿Qué puedes hacer?*\n"
+    "• Intenta enviar otra foto con mejor calidad\n"
+    "• Asegúrate de que el cheque esté completo y claro\n"
+    "• Verifica que la iluminación sea buena\n\n"
+    "Si el problema persiste, por favor contacta al soporte.\n\n"
+    "¡Lo siento por las molestias! 😊"
+)
+
+
+# Fixed blocks of the cheque reply
+CHEQUE_TITLE = "✅ *¡Listo! Aquí está la información de tu cheque*\n\n"
+SEP = "━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
+CHEQUE_HEADER = f"{SEP}📊 *INFORMACIÓN DEL CHEQUE*\n{SEP}\n"
+BCRA_HEADER = f"{SEP}🏛️ *VALIDACIÓN BCRA*\n{SEP}\n"
+BCRA_UNAVAILABLE = "ℹ️ *Nota:* No se pudo obtener información adicional del BCRA en este momento.\n\n"
+CHEQUE_FOOTER = f"{SEP}✨ *Procesamiento completado*\n\n¿Necesitas procesar otro cheque? ¡Solo envíame otra foto! 📸"
+
+
+# getFile only resolves a path, so fail fast instead of holding an update slot
+GET_FILE_TIMEOUTS = {"read_timeout": 10, "connect_timeout": 5}
+
+# Caps concurrent Telegram replies process-wide (Telegram allows ~30 msg/s per bot)
+_REPLY_SEMAPHORE = asyncio.Semaphore(20)
+
+# Up to this many cheques are sent as a single Telegram message
+COALESCE_MAX_CHEQUES = 3
+
+# Escapes _ * ` [ in extracted fields so legacy Markdown replies always parse
+_esc = escape_markdown
+
+
+def format_cheque_message(cheque, index: int, total: int) -> str:
+    """
+    Format cheque data as a Markdown reply.
+    
+    Args:
+        cheque: ChequeData to format
+        index: 1-based position of the cheque in the document
+        total: Number of cheques found in the document
+        
+    Returns:
+        Reply text
+    """
+    parts = [CHEQUE_TITLE]
+    
+    if total > 1:
+        parts.append(f"📋 *Cheque {index} de {total}*\n\n")
+    
+    parts.append(CHEQUE_HEADER)
+    parts.append(
+        f"🏦 *Banco:* {_esc(cheque.banco) or 'No disponible'}\n"
+        f"💰 *Importe:* ${cheque.importe:,.2f}\n"
+        f"📅 *Fecha de Emisión:* {_esc(cheque.fecha_emision) or 'No disponible'}\n"
+        f"📅 *Fecha de Pago:* {_esc(cheque.fecha_pago) or 'No disponible'}\n"
+        f"🔢 *Número de Cheque:* {_esc(cheque.numero_cheque) or 'No disponible'}\n"
+        f"🆔 *CUIT del Librador:* {_esc(cheque.cuit_librador) or 'No disponible'}\n\n"
+    )
+    
+    # BCRA Information section
+    bcra_lines = [
+        line for present, line in (
+            (cheque.estado_bcra, f"✅ *Estado:* {_esc(cheque.estado_bcra)}\n"),
+            (cheque.cheques_rechazados > 0, f"⚠️ *Cheques Rechazados:* {cheque.cheques_rechazados}\n"),
+            (cheque.riesgo_crediticio, f"📊 *Riesgo Crediticio:* {_esc(cheque.riesgo_crediticio)}\n"),
+        ) if present
+    ]
+    
+    if bcra_lines:
+        parts.append(BCRA_HEADER)
+        parts.extend(bcra_lines)
+    else:
+        parts.append(BCRA_UNAVAILABLE)
+    
+    parts.append(CHEQUE_FOOTER)
+    
+    return "".join(parts)
+
+
+def coalesce_messages(texts: List[str]) -> List[str]:
+    """
+    Join a small batch of replies into one message when it fits Telegram's limit.
+    
+    Args:
+        texts: Formatted replies, one per cheque
+        
+    Returns:
+        A single combined reply, or the original list
+    """
+    if 1 < len(texts) <= COALESCE_MAX_CHEQUES:
+        combined = "\n\n".join(texts)
+        # Telegram counts UTF-16 code units (emoji take two)
+        if len(combined.encode("utf-16-le")) // 2 <= MessageLimit.MAX_TEXT_LENGTH:
+            return [combined]
+    return texts
+
+
+async def reply_limited(message, text: str):
+    """Reply with Markdown, bounded by the process-wide reply semaphore."""
+    async with _REPLY_SEMAPHORE:
+        return await message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+
+
+async def await_ack(ack: Optional[asyncio.Task]):
+    """Wait for a pending acknowledgment so later replies keep their order."""
+    if ack is None:
+        return
+    try:
+        await ack
+    except Exception as e:
+        logger.warning("Could not send acknowledgment: %s", e)
@@ -1,6 +1,8 @@
 """
 Configuration settings using Pydantic Settings.
 """
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 
@@ -13,15 +15,24 @@ class Settings(BaseSettings):
     # Gemini API
     gemini_api_key: str = ""
     gemini_model: str = "gemini-2.5-flash"
+    gemini_max_concurrency: int = 4  # Max concurrent Gemini requests per process
+    gemini_cache_ttl: int = 86400  # Seconds to reuse a Gemini extraction for identical files (0 disables the cache)
+    gemini_cache_maxsize: int = 256
     
     # API Server
     api_host: str = "0.0.0.0"
     api_port: int = 8000
+    api_workers: int = 1  # Uvicorn worker processes; for I/O-bound load use (2 * CPU) + 1
     api_base_url: str = "http://localhost:8000"
     webhook_url: str = ""  # URL completa del webhook (ej: https://dataentrybot.onrender.com/api/webhook)
+    webhook_max_concurrency: int = 16  # Webhook updates processed at once in the background
+    max_upload_size: int = 20 * 1024 * 1024  # Bytes (20 MB)
+    cors_origins: str = "*"  # Comma-separated allowed origins (ej: https://web.telegram.org)
     
     # BCRA API
     bcra_api_url: str = "https://api.bcra.gob.ar"
+    bcra_cache_ttl: int = 300  # Seconds to reuse BCRA responses (0 disables the cache)
+    bcra_cache_maxsize: int = 1024
     
     # AFIP API (Padrón A13)
     afip_token: str = ""
@@ -39,5 +50,16 @@ class Settings(BaseSettings):
         extra = "ignore"  # Ignorar campos extra del .env que no están definidos
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Return the process-wide Settings, reading the environment and .env once.
+    
+    Returns:
+        Cached Settings instance
+    """
+    return Settings()
+
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
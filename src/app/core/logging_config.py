@@ -0,0 +1,48 @@
+"""
+Logging setup shared by the API and the standalone bot entry points.
+"""
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+from src.app.core.config import settings
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Listener started by the first setup_logging() call in this process
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Configure root logging so the event loop only enqueues records.
+    
+    The QueueHandler only merges each message with its arguments; a
+    background QueueListener thread applies LOG_FORMAT and writes the
+    records to stderr, so slow sinks never block request or update handling.
+    
+    Safe to call more than once: `python -m src.app.main` imports main.py
+    twice (as __main__ and again through uvicorn), and a second
+    QueueHandler would print every line twice.
+    
+    Returns:
+        The started QueueListener (call stop() on shutdown to flush it)
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return _log_listener
+    
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, log_handler, respect_handler_level=True)
+    
+    # Not basicConfig: it would give the QueueHandler a full formatter too,
+    # so every line would be formatted twice (once on the event loop)
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, settings.log_level.upper()))
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener.start()
+    _log_listener = log_listener
+    return log_listener
@@ -1,34 +1,136 @@
 """
 Main FastAPI application entry point.
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from src.app.core.config import settings
+from src.app.core.logging_config import setup_logging
+from telegram import Bot, Update
+from telegram.request import HTTPXRequest
 from src.app.api.routes import router
+from src.app.services.cheques_processor import ChequesProcessor
+from src.app.services.gemini_client import GeminiClient
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: the event loop only enqueues records, a background
+# thread formats and writes them
+log_listener = setup_logging()
 
 logger = logging.getLogger(__name__)
 
+# Allowance for multipart boundaries and part headers on top of the file size
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized uploads from their Content-Length header.
+    
+    Runs before FastAPI parses the multipart body, so hostile uploads are
+    refused without reading them. Applies to every POST under `path`.
+    """
+    
+    def __init__(self, app, path: str, max_size: int):
+        self.app = app
+        self.path = path
+        self.max_size = max_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].startswith(self.path):
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_size:
+                        response = ORJSONResponse({"detail": "File too large"}, status_code=413)
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared clients once the event loop is running and release them on shutdown."""
+    logger.info("Starting Data Entry Bot API...")
+    logger.info(f"API running on {settings.api_host}:{settings.api_port}")
+    
+    # Shared clients, injected into the routes via Depends
+    app.state.gemini_client = GeminiClient()
+    app.state.cheques_processor = ChequesProcessor(gemini_client=app.state.gemini_client)
+    # Bot used by the webhook route (built once, without Application/Updater).
+    # A larger keep-alive HTTP/2 pool lets ack, download and result replies reuse connections
+    app.state.bot = None
+    if settings.telegram_bot_token:
+        app.state.bot = Bot(
+            token=settings.telegram_bot_token,
+            request=HTTPXRequest(
+                connection_pool_size=32,
+                http_version="2",
+                read_timeout=30,
+                connect_timeout=5
+            )
+        )
+        try:
+            # Warm the connection pool (calls getMe)
+            await app.state.bot.initialize()
+        except Exception as e:
+            logger.warning(f"⚠️  No se pudo inicializar el bot de Telegram: {str(e)}")
+    
+    # Configure webhook if URL is provided (through the bot's async HTTP pool,
+    # so startup never blocks the event loop)
+    if app.state.bot is not None and settings.webhook_url:
+        try:
+            # Let Telegram open up to 100 parallel webhook connections (default 40) and
+            # deliver only messages, the only update type the webhook handles
+            await app.state.bot.set_webhook(
+                url=settings.webhook_url,
+                max_connections=100,
+                allowed_updates=[Update.MESSAGE],
+                read_timeout=10
+            )
+            logger.info(f"✅ Webhook configurado: {settings.webhook_url}")
+        except Exception as e:
+            logger.warning(f"⚠️  No se pudo configurar webhook automáticamente: {str(e)}")
+    elif settings.telegram_bot_token:
+        logger.info("Telegram Bot token configurado - webhook listo en /api/webhook (configurar WEBHOOK_URL para auto-configuración)")
+    
+    yield
+    
+    logger.info("Shutting down Data Entry Bot API...")
+    await app.state.cheques_processor.aclose()
+    if app.state.bot is not None:
+        await app.state.bot.shutdown()
+    log_listener.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Data Entry Bot API",
     description="API para automatización de data entry con Telegram Bot y Gemini 2.5 LLM",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# CORS middleware
+# CORS middleware. Credentials only go to explicitly listed origins: with "*"
+# Starlette echoes any request Origin back, which would let every site send
+# credentialed requests
+cors_origins = [origin.strip() for origin in settings.cors_origins.split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify allowed origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=cors_origins,
+    allow_credentials="*" not in cors_origins,
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,  # Let browsers cache the preflight for a day
+)
+
+# Reject oversized uploads before the body is parsed
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path="/api/upload",
+    max_size=settings.max_upload_size + MULTIPART_OVERHEAD
 )
 
 # Include routers
@@ -45,31 +147,15 @@ async def root():
     }
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Startup event handler."""
-    logger.info("Starting Data Entry Bot API...")
-    logger.info(f"API running on {settings.api_host}:{settings.api_port}")
+if __name__ == "__main__":
+    import uvicorn
     
-    # Configure webhook if URL is provided
-    if settings.telegram_bot_token and settings.webhook_url:
-        try:
-            import requests
-            webhook_api_url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/setWebhook"
-            response = requests.post(webhook_api_url, json={"url": settings.webhook_url}, timeout=10)
-            if response.json().get("ok"):
-                logger.info(f"✅ Webhook configurado: {settings.webhook_url}")
-            else:
-                logger.warning(f"⚠️  Error configurando webhook: {response.json()}")
-        except Exception as e:
-            logger.warning(f"⚠️  No se pudo configurar webhook automáticamente: {str(e)}")
-    elif settings.telegram_bot_token:
-        logger.info("Telegram Bot token configurado - webhook listo en /api/webhook (configurar WEBHOOK_URL para auto-configuración)")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Shutdown event handler."""
-    logger.info("Shutting down Data Entry Bot API...")
-
-
+    # uvloop + httptools come with uvicorn[standard]
+    uvicorn.run(
+        "src.app.main:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        loop="uvloop",
+        http="httptools",
+        workers=settings.api_workers
+    )
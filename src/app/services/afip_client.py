@@ -10,6 +10,8 @@ from src.app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+_NON_DIGIT_RE = re.compile(r'\D')
+
 
 class AFIPClient:
     """Client for AFIP Padrón A13 API."""
@@ -41,7 +43,7 @@ class AFIPClient:
             return None
         
         # Remove all non-digit characters
-        digits = re.sub(r'\D', '', cuit)
+        digits = _NON_DIGIT_RE.sub('', cuit)
         
         if len(digits) == 11:
             try:
@@ -2,23 +2,116 @@
 Client for BCRA (Banco Central de la República Argentina) API.
 Handles credit status checks, debt queries, and rejected cheques.
 """
+import asyncio
 import logging
 import re
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, Any, Optional, List
 import aiohttp
+import orjson
 from src.app.core.config import settings
+from src.app.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(slots=True)
+class BCRACreditStatus:
+    """Consolidated credit status for a CUIT."""
+    estado_bcra: str = ""
+    cheques_rechazados: int = 0
+    riesgo_crediticio: str = ""
+    detalles: Dict[str, Any] = field(default_factory=dict)
+
+
+_NON_DIGIT_RE = re.compile(r'\D')
+
+# Weights for the CUIT check digit (mod 11)
+_CUIT_WEIGHTS = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+
+
+def _is_valid_cuit(digits: str) -> bool:
+    """
+    Validate the CUIT check digit.
+    
+    Args:
+        digits: 11-digit CUIT string
+        
+    Returns:
+        True if the last digit matches the mod 11 checksum
+    """
+    total = sum(int(d) * w for d, w in zip(digits, _CUIT_WEIGHTS))
+    check = 11 - total % 11
+    if check == 11:
+        check = 0
+    elif check == 10:
+        check = 9
+    return check == int(digits[10])
+
+
+@lru_cache(maxsize=4096)
+def _parse_identificacion(cuit: str) -> Optional[int]:
+    """Convert a CUIT string to its integer identification (cached)."""
+    # Remove all non-digit characters
+    digits = _NON_DIGIT_RE.sub('', cuit)
+    
+    if len(digits) != 11:
+        return None
+    
+    # Reject bad CUITs (e.g. OCR misreads) before any request to BCRA
+    if not _is_valid_cuit(digits):
+        logger.warning(f"Invalid CUIT check digit: {cuit}")
+        return None
+    
+    return int(digits)
+
+
 class BCRAClient:
     """Client for BCRA Central de Deudores API."""
     
     def __init__(self):
         """Initialize BCRA client with configuration."""
         self.base_url = settings.bcra_api_url.rstrip('/')
+        # Endpoint URLs built once; each request only appends the identification
+        self._deudas_url = f"{self.base_url}/centraldedeudores/v1.0/Deudas/"
+        self._cheques_rechazados_url = f"{self.base_url}/centraldedeudores/v1.0/Deudas/ChequesRechazados/"
+        self._deudas_historicas_url = f"{self.base_url}/centraldedeudores/v1.0/Deudas/Historicas/"
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Response cache: url -> data
+        self._cache = TTLCache(settings.bcra_cache_ttl, settings.bcra_cache_maxsize)
         logger.info(f"BCRA client initialized (base_url={self.base_url})")
     
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the shared HTTP session, creating it on first use.
+        
+        The session is created lazily so it binds to the running event loop,
+        and is reused across endpoints to keep connections alive.
+        
+        Returns:
+            aiohttp ClientSession
+        """
+        if self._session is None or self._session.closed:
+            # Deshabilitar verificación SSL temporalmente para pruebas locales
+            connector = aiohttp.TCPConnector(
+                ssl=False,
+                limit=64,
+                limit_per_host=16,
+                keepalive_timeout=75
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._session
+    
+    async def aclose(self):
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     def _cuit_to_identificacion(self, cuit: str) -> Optional[int]:
         """
         Convert CUIT from format XX-XXXXXXXX-X to integer (just digits).
@@ -32,75 +125,85 @@ class BCRAClient:
         if not cuit:
             return None
         
-        # Remove all non-digit characters
-        digits = re.sub(r'\D', '', cuit)
-        
-        if len(digits) == 11:
-            try:
-                return int(digits)
-            except ValueError:
-                return None
-        
-        return None
+        return _parse_identificacion(cuit)
     
     async def _make_request(
         self, 
-        endpoint: str, 
+        url_prefix: str, 
         identificacion: int
     ) -> Dict[str, Any]:
         """
         Make HTTP request to BCRA API.
         
+        Successful responses are cached per URL for `bcra_cache_ttl` seconds.
+        
         Args:
-            endpoint: API endpoint path
+            url_prefix: Endpoint URL up to (and including) the trailing slash
             identificacion: Identification number (CUIT as integer)
             
         Returns:
             Response data as dictionary
         """
-        url = f"{self.base_url}{endpoint.format(Identificacion=identificacion)}"
+        url = f"{url_prefix}{identificacion}"
         
+        cached = self._cache.get(url)
+        if cached is not None:
+            logger.debug(f"BCRA cache hit: {url}")
+            return cached
+        
+        data = await self._fetch(url, identificacion)
+        if data.get("status") == 0:
+            self._cache.set(url, data)
+        return data
+    
+    async def _fetch(self, url: str, identificacion: int) -> Dict[str, Any]:
+        """
+        Perform the HTTP GET against BCRA API and normalize the response.
+        
+        Args:
+            url: Full request URL
+            identificacion: Identification number (CUIT as integer)
+            
+        Returns:
+            Response data as dictionary
+        """
         headers = {
             "Accept": "application/json",
             "Content-Type": "application/json"
         }
         
         try:
-            # Deshabilitar verificación SSL temporalmente para pruebas locales
-            ssl_context = False  # Deshabilita verificación SSL
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # La API puede retornar status 200 (HTTP) con diferentes formatos JSON
-                        # Normalizar a formato esperado: {"status": 0, "results": {...}}
-                        if isinstance(data, dict):
-                            # Si ya tiene "status" y "results", retornarlo tal cual
-                            if "status" in data and "results" in data:
-                                # Si status es 200 (HTTP code), cambiarlo a 0 (success)
-                                if data.get("status") == 200:
-                                    data["status"] = 0
-                                return data
-                            # Si tiene "results" pero no "status", agregar status: 0
-                            elif "results" in data:
-                                return {"status": 0, "results": data["results"]}
-                            # Si es un dict sin estructura conocida, envolverlo
-                            else:
-                                return {"status": 0, "results": data}
-                        # Si no es dict, envolverlo
-                        return {"status": 0, "results": {}}
-                    elif response.status == 404:
-                        logger.warning(f"BCRA API: No data found for identificacion {identificacion}")
-                        return {"status": 0, "results": {}}
-                    elif response.status == 400:
-                        error_data = await response.json()
-                        logger.error(f"BCRA API Bad Request: {error_data}")
-                        return {"status": -1, "errorMessages": error_data.get("errorMessages", [])}
-                    else:
-                        logger.error(f"BCRA API error: Status {response.status}")
-                        return {"status": -1, "error": f"HTTP {response.status}"}
+            session = await self._get_session()
+            async with session.get(url, headers=headers) as response:
+                if response.status == 200:
+                    data = await response.json(loads=orjson.loads)
+                    # La API puede retornar status 200 (HTTP) con diferentes formatos JSON
+                    # Normalizar a formato esperado: {"status": 0, "results": {...}}
+                    if isinstance(data, dict):
+                        # Si ya tiene "status" y "results", retornarlo tal cual
+                        if "status" in data and "results" in data:
+                            # Si status es 200 (HTTP code), cambiarlo a 0 (success)
+                            if data.get("status") == 200:
+                                data["status"] = 0
+                            return data
+                        # Si tiene "results" pero no "status", agregar status: 0
+                        elif "results" in data:
+                            return {"status": 0, "results": data["results"]}
+                        # Si es un dict sin estructura conocida, envolverlo
+                        else:
+                            return {"status": 0, "results": data}
+                    # Si no es dict, envolverlo
+                    return {"status": 0, "results": {}}
+                elif response.status == 404:
+                    logger.warning(f"BCRA API: No data found for identificacion {identificacion}")
+                    return {"status": 0, "results": {}}
+                elif response.status == 400:
+                    error_data = await response.json(loads=orjson.loads)
+                    logger.error(f"BCRA API Bad Request: {error_data}")
+                    return {"status": -1, "errorMessages": error_data.get("errorMessages", [])}
+                else:
+                    logger.error(f"BCRA API error: Status {response.status}")
+                    return {"status": -1, "error": f"HTTP {response.status}"}
         except aiohttp.ClientError as e:
             logger.error(f"BCRA API request error: {str(e)}")
             return {"status": -1, "error": str(e)}
@@ -122,8 +225,7 @@ class BCRAClient:
         if not identificacion:
             return {"status": -1, "error": "Invalid CUIT format"}
         
-        endpoint = "/centraldedeudores/v1.0/Deudas/{Identificacion}"
-        return await self._make_request(endpoint, identificacion)
+        return await self._make_request(self._deudas_url, identificacion)
     
     async def get_cheques_rechazados(self, cuit: str) -> Dict[str, Any]:
         """
@@ -139,8 +241,7 @@ class BCRAClient:
         if not identificacion:
             return {"status": -1, "error": "Invalid CUIT format"}
         
-        endpoint = "/centraldedeudores/v1.0/Deudas/ChequesRechazados/{Identificacion}"
-        return await self._make_request(endpoint, identificacion)
+        return await self._make_request(self._cheques_rechazados_url, identificacion)
     
     async def get_deudas_historicas(self, cuit: str) -> Dict[str, Any]:
         """
@@ -156,10 +257,9 @@ class BCRAClient:
         if not identificacion:
             return {"status": -1, "error": "Invalid CUIT format"}
         
-        endpoint = "/centraldedeudores/v1.0/Deudas/Historicas/{Identificacion}"
-        return await self._make_request(endpoint, identificacion)
+        return await self._make_request(self._deudas_historicas_url, identificacion)
     
-    async def check_credit_status(self, cuit: str) -> Dict[str, Any]:
+    async def check_credit_status(self, cuit: str) -> BCRACreditStatus:
         """
         Check credit status for a CUIT by consolidating information from multiple endpoints.
         
@@ -167,7 +267,7 @@ class BCRAClient:
             cuit: CUIT string in format XX-XXXXXXXX-X
             
         Returns:
-            Dictionary with:
+            BCRACreditStatus with:
             - estado_bcra: Credit status description
             - cheques_rechazados: Number of rejected cheques
             - riesgo_crediticio: Risk level (A, B, C, etc.)
@@ -175,21 +275,40 @@ class BCRAClient:
         """
         logger.info(f"Checking credit status for CUIT: {cuit}")
         
-        # Get all relevant information
-        deudas_data = await self.get_deudas(cuit)
-        cheques_data = await self.get_cheques_rechazados(cuit)
+        # A CUIT that fails the check digit (e.g. an OCR misread) is never sent to BCRA
+        if not self._cuit_to_identificacion(cuit):
+            return BCRACreditStatus(
+                estado_bcra="CUIT inválido",
+                riesgo_crediticio="N/A",
+                detalles={
+                    "monto_total": 0.0,
+                    "situaciones": [],
+                    "tiene_deuda_actual": False,
+                    "datos_disponibles": False,
+                    "error": "Invalid CUIT format"
+                }
+            )
+        
+        # Get all relevant information (independent requests, run concurrently)
+        deudas_data, cheques_data = await asyncio.gather(
+            self.get_deudas(cuit),
+            self.get_cheques_rechazados(cuit),
+            return_exceptions=True
+        )
+        
+        if isinstance(deudas_data, BaseException):
+            logger.error(f"Error fetching BCRA deudas: {str(deudas_data)}")
+            deudas_data = {"status": -1, "error": str(deudas_data)}
+        if isinstance(cheques_data, BaseException):
+            logger.error(f"Error fetching BCRA cheques rechazados: {str(cheques_data)}")
+            cheques_data = {"status": -1, "error": str(cheques_data)}
         
         # Log raw responses for debugging
         logger.debug(f"BCRA deudas_data status: {deudas_data.get('status')}, has results: {'results' in deudas_data}")
         logger.debug(f"BCRA cheques_data status: {cheques_data.get('status')}, has results: {'results' in cheques_data}")
         
         # Initialize response
-        response = {
-            "estado_bcra": "",
-            "cheques_rechazados": 0,
-            "riesgo_crediticio": "",
-            "detalles": {}
-        }
+        response = BCRACreditStatus()
         
         # Process rejected cheques
         cheques_rechazados = 0
@@ -203,7 +322,7 @@ class BCRAClient:
                             if "detalle" in entidad:
                                 cheques_rechazados += len(entidad["detalle"])
         
-        response["cheques_rechazados"] = cheques_rechazados
+        response.cheques_rechazados = cheques_rechazados
         
         # Process current debts
         tiene_deuda = False
@@ -236,35 +355,35 @@ class BCRAClient:
             logger.warning(f"Error querying BCRA deudas: {deudas_data.get('error', 'Unknown error')}")
         
         # Determine credit status
-        if not datos_disponibles and deudas_data.get("status") != -1:
-            # No data available from API (empty response)
-            response["estado_bcra"] = "Sin datos disponibles en BCRA"
-            response["riesgo_crediticio"] = "N/A"
+        if not datos_disponibles:
+            # No data available from API (empty response or failed request)
+            response.estado_bcra = "Sin datos disponibles en BCRA"
+            response.riesgo_crediticio = "N/A"
         elif tiene_deuda:
             if monto_total > 0:
-                response["estado_bcra"] = f"Con deuda - Monto: ${monto_total:,.2f}"
+                response.estado_bcra = f"Con deuda - Monto: ${monto_total:,.2f}"
             else:
-                response["estado_bcra"] = "Con deuda registrada"
+                response.estado_bcra = "Con deuda registrada"
             
             # Determine risk level based on situation codes and amount
             max_situacion = max(situaciones) if situaciones else 0
             if max_situacion >= 5 or monto_total > 1000000:
-                response["riesgo_crediticio"] = "C"
+                response.riesgo_crediticio = "C"
             elif max_situacion >= 3 or monto_total > 500000:
-                response["riesgo_crediticio"] = "B"
+                response.riesgo_crediticio = "B"
             else:
-                response["riesgo_crediticio"] = "B-"
+                response.riesgo_crediticio = "B-"
         else:
             # datos_disponibles is True but no debt found
             if cheques_rechazados > 0:
-                response["estado_bcra"] = f"Sin deuda actual, pero con {cheques_rechazados} cheque(s) rechazado(s)"
-                response["riesgo_crediticio"] = "B-"
+                response.estado_bcra = f"Sin deuda actual, pero con {cheques_rechazados} cheque(s) rechazado(s)"
+                response.riesgo_crediticio = "B-"
             else:
-                response["estado_bcra"] = "Sin deuda"
-                response["riesgo_crediticio"] = "A"
+                response.estado_bcra = "Sin deuda"
+                response.riesgo_crediticio = "A"
         
         # Add details
-        response["detalles"] = {
+        response.detalles = {
             "monto_total": monto_total,
             "situaciones": situaciones,
             "tiene_deuda_actual": tiene_deuda,
@@ -272,6 +391,6 @@ class BCRAClient:
             "error": deudas_data.get("error") if deudas_data.get("status") == -1 else None
         }
         
-        logger.info(f"Credit status for {cuit}: {response['estado_bcra']}, Riesgo: {response['riesgo_crediticio']}")
+        logger.info(f"Credit status for {cuit}: {response.estado_bcra}, Riesgo: {response.riesgo_crediticio}")
         
         return response
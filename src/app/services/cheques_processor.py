@@ -2,25 +2,43 @@
 Specialized processor for cheque documents.
 Handles cheque detection, extraction, and BCRA validation.
 """
+import asyncio
 import logging
 from typing import Dict, Any, Optional, List
 from src.app.core.models import ChequeData
 from src.app.services.gemini_client import GeminiClient
 from src.app.services.bcra_client import BCRAClient
+from src.app.utils.file import BytesLike
 import re
 
 logger = logging.getLogger(__name__)
 
+_NON_DIGIT_RE = re.compile(r'\D')
+_CUIT_PARTS_RE = re.compile(r'(\d{2})-?(\d{8})-?(\d)')
+_IMPORTE_JUNK_RE = re.compile(r'[^\d.,]')
+
+# BCRA lookups run concurrently for multi-cheque documents, at most this many at a time
+BCRA_LOOKUP_CONCURRENCY = 8
+
 
 class ChequesProcessor:
     """Processor for cheque documents."""
     
-    def __init__(self):
-        """Initialize cheque processor with Gemini and BCRA clients."""
-        self.gemini_client = GeminiClient()
+    def __init__(self, gemini_client: Optional[GeminiClient] = None):
+        """
+        Initialize cheque processor with Gemini and BCRA clients.
+        
+        Args:
+            gemini_client: Shared Gemini client. If None, a new one is created.
+        """
+        self.gemini_client = gemini_client or GeminiClient()
         self.bcra_client = BCRAClient()
         logger.info("Cheques processor initialized")
     
+    async def aclose(self):
+        """Release HTTP resources held by the underlying clients."""
+        await self.bcra_client.aclose()
+    
     def is_cheque(self, image_data: bytes, filename: Optional[str] = None) -> bool:
         """
         Detect if an image/document is a cheque.
@@ -44,7 +62,7 @@ class ChequesProcessor:
     
     async def detect_and_process_cheques(
         self,
-        image_data: bytes,
+        image_data: BytesLike,
         mime_type: str = "image/jpeg",
         filename: Optional[str] = None
     ) -> List[ChequeData]:
@@ -65,7 +83,7 @@ class ChequesProcessor:
     
     async def process_multiple_cheques(
         self,
-        image_data: bytes,
+        image_data: BytesLike,
         mime_type: str = "image/jpeg"
     ) -> List[ChequeData]:
         """
@@ -112,52 +130,21 @@ class ChequesProcessor:
             
             logger.info(f"Found {len(cheques_raw)} cheque(s) in document")
             
-            # Process each cheque
-            for idx, cheque_raw in enumerate(cheques_raw):
-                try:
-                    # Normalize and validate data (handle None values)
-                    cuit_librador = self._normalize_cuit(cheque_raw.get("cuit_librador") or "")
-                    banco = (cheque_raw.get("banco") or "").strip() if cheque_raw.get("banco") else ""
-                    fecha_emision = (cheque_raw.get("fecha_emision") or "").strip() if cheque_raw.get("fecha_emision") else ""
-                    fecha_pago = (cheque_raw.get("fecha_pago") or "").strip() if cheque_raw.get("fecha_pago") else ""
-                    importe = self._parse_importe(cheque_raw.get("importe", 0))
-                    numero_cheque = str(cheque_raw.get("numero_cheque") or "").strip() if cheque_raw.get("numero_cheque") else ""
-                    cbu_benef = cheque_raw.get("cbu_beneficiario")
-                    cbu_beneficiario = (cbu_benef.strip() if cbu_benef and isinstance(cbu_benef, str) else None) if cbu_benef else None
-                    
-                    # Check BCRA status if CUIT is available
-                    estado_bcra = ""
-                    cheques_rechazados = 0
-                    riesgo_crediticio = ""
-                    
-                    if cuit_librador:
-                        logger.info(f"Checking BCRA status for CUIT {idx+1}/{len(cheques_raw)}: {cuit_librador}")
-                        bcra_status = await self.bcra_client.check_credit_status(cuit_librador)
-                        estado_bcra = bcra_status.get("estado_bcra", "")
-                        cheques_rechazados = bcra_status.get("cheques_rechazados", 0)
-                        riesgo_crediticio = bcra_status.get("riesgo_crediticio", "")
-                    
-                    # Build ChequeData model
-                    cheque_data = ChequeData(
-                        tipo_documento="cheque",
-                        cuit_librador=cuit_librador,
-                        banco=banco,
-                        fecha_emision=fecha_emision,
-                        fecha_pago=fecha_pago,
-                        importe=importe,
-                        numero_cheque=numero_cheque,
-                        cbu_beneficiario=cbu_beneficiario,
-                        estado_bcra=estado_bcra,
-                        cheques_rechazados=cheques_rechazados,
-                        riesgo_crediticio=riesgo_crediticio
-                    )
-                    
-                    cheques_list.append(cheque_data)
-                    logger.info(f"Cheque {idx+1} processed: CUIT={cuit_librador}, Importe={importe}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing cheque {idx+1}: {str(e)}")
+            # Process all cheques concurrently (BCRA lookups bounded by a semaphore)
+            bcra_semaphore = asyncio.Semaphore(BCRA_LOOKUP_CONCURRENCY)
+            results = await asyncio.gather(
+                *[
+                    self._build_cheque(cheque_raw, idx, len(cheques_raw), bcra_semaphore)
+                    for idx, cheque_raw in enumerate(cheques_raw)
+                ],
+                return_exceptions=True
+            )
+            
+            for idx, result in enumerate(results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Error processing cheque {idx+1}: {str(result)}")
                     continue
+                cheques_list.append(result)
             
             logger.info(f"Successfully processed {len(cheques_list)} cheque(s)")
             return cheques_list
@@ -166,9 +153,69 @@ class ChequesProcessor:
             logger.error(f"Error processing multiple cheques: {str(e)}")
             return []
     
+    async def _build_cheque(
+        self,
+        cheque_raw: Dict[str, Any],
+        idx: int,
+        total: int,
+        bcra_semaphore: asyncio.Semaphore
+    ) -> ChequeData:
+        """
+        Normalize one extracted cheque and enrich it with its BCRA status.
+        
+        Args:
+            cheque_raw: Cheque fields as returned by Gemini
+            idx: Position of the cheque in the document (0-based)
+            total: Number of cheques in the document
+            bcra_semaphore: Bounds concurrent BCRA lookups for the document
+            
+        Returns:
+            ChequeData model
+        """
+        # Normalize and validate data (handle None values)
+        cuit_librador = self._normalize_cuit(cheque_raw.get("cuit_librador") or "")
+        banco = (cheque_raw.get("banco") or "").strip() if cheque_raw.get("banco") else ""
+        fecha_emision = (cheque_raw.get("fecha_emision") or "").strip() if cheque_raw.get("fecha_emision") else ""
+        fecha_pago = (cheque_raw.get("fecha_pago") or "").strip() if cheque_raw.get("fecha_pago") else ""
+        importe = self._parse_importe(cheque_raw.get("importe", 0))
+        numero_cheque = str(cheque_raw.get("numero_cheque") or "").strip() if cheque_raw.get("numero_cheque") else ""
+        cbu_benef = cheque_raw.get("cbu_beneficiario")
+        cbu_beneficiario = (cbu_benef.strip() if cbu_benef and isinstance(cbu_benef, str) else None) if cbu_benef else None
+        
+        # Check BCRA status if CUIT is available
+        estado_bcra = ""
+        cheques_rechazados = 0
+        riesgo_crediticio = ""
+        
+        if cuit_librador:
+            logger.info(f"Checking BCRA status for CUIT {idx+1}/{total}: {cuit_librador}")
+            async with bcra_semaphore:
+                bcra_status = await self.bcra_client.check_credit_status(cuit_librador)
+            estado_bcra = bcra_status.estado_bcra
+            cheques_rechazados = bcra_status.cheques_rechazados
+            riesgo_crediticio = bcra_status.riesgo_crediticio
+        
+        # Build ChequeData model
+        cheque_data = ChequeData(
+            tipo_documento="cheque",
+            cuit_librador=cuit_librador,
+            banco=banco,
+            fecha_emision=fecha_emision,
+            fecha_pago=fecha_pago,
+            importe=importe,
+            numero_cheque=numero_cheque,
+            cbu_beneficiario=cbu_beneficiario,
+            estado_bcra=estado_bcra,
+            cheques_rechazados=cheques_rechazados,
+            riesgo_crediticio=riesgo_crediticio
+        )
+        
+        logger.info(f"Cheque {idx+1} processed: CUIT={cuit_librador}, Importe={importe}")
+        return cheque_data
+    
     async def process_cheque(
         self, 
-        image_data: bytes, 
+        image_data: BytesLike, 
         mime_type: str = "image/jpeg"
     ) -> ChequeData:
         """
@@ -210,9 +257,9 @@ class ChequesProcessor:
             if cuit_librador:
                 logger.info(f"Checking BCRA status for CUIT: {cuit_librador}")
                 bcra_status = await self.bcra_client.check_credit_status(cuit_librador)
-                estado_bcra = bcra_status.get("estado_bcra", "")
-                cheques_rechazados = bcra_status.get("cheques_rechazados", 0)
-                riesgo_crediticio = bcra_status.get("riesgo_crediticio", "")
+                estado_bcra = bcra_status.estado_bcra
+                cheques_rechazados = bcra_status.cheques_rechazados
+                riesgo_crediticio = bcra_status.riesgo_crediticio
             
             # Step 5: Build ChequeData model
             cheque_data = ChequeData(
@@ -249,8 +296,13 @@ class ChequesProcessor:
         if not cuit:
             return ""
         
+        # Fast path: CUIT already as XX-XXXXXXXX-X or 11 plain digits
+        match = _CUIT_PARTS_RE.fullmatch(cuit)
+        if match:
+            return f"{match[1]}-{match[2]}-{match[3]}"
+        
         # Remove all non-digit characters
-        digits = re.sub(r'\D', '', cuit)
+        digits = _NON_DIGIT_RE.sub('', cuit)
         
         # Format as XX-XXXXXXXX-X
         if len(digits) == 11:
@@ -273,7 +325,7 @@ class ChequesProcessor:
         
         if isinstance(importe, str):
             # Remove currency symbols and spaces
-            importe_clean = re.sub(r'[^\d.,]', '', importe)
+            importe_clean = _IMPORTE_JUNK_RE.sub('', importe)
             # Replace comma with dot for decimal
             importe_clean = importe_clean.replace(',', '.')
             try:
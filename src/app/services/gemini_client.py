@@ -2,13 +2,195 @@
 Client for Google Gemini LLM with Vision capabilities.
 Uses Gemini 2.5 (latest version) with advanced reasoning for intelligent document processing.
 """
+import asyncio
+import hashlib
+import json
+import re
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from typing import Optional, Dict, Any
 import logging
 from src.app.core.config import settings
+from src.app.utils.cache import TTLCache
+from src.app.utils.file import BytesLike
 
 logger = logging.getLogger(__name__)
 
+# Retries on 429 (rate limit), with exponential backoff starting at 1s
+GEMINI_MAX_RETRIES = 3
+
+# Shared across all GeminiClient instances so the cap applies process-wide
+_generate_semaphore = asyncio.Semaphore(settings.gemini_max_concurrency)
+
+# Up to 10 pages are rasterized to avoid memory issues
+PDF_MAX_PAGES = 10
+
+
+def _pdf_to_image(pdf_data: BytesLike):
+    """
+    Rasterize a PDF, stacking all pages vertically so Gemini sees every cheque at once.
+    
+    Blocking (poppler subprocess plus PIL work): call it through _run_pdf_worker.
+    
+    Args:
+        pdf_data: Binary PDF data
+        
+    Returns:
+        PIL image with the combined pages
+        
+    Raises:
+        ValueError: If the PDF has no renderable pages
+    """
+    from pdf2image import convert_from_bytes
+    from PIL import Image
+    
+    images = convert_from_bytes(pdf_data, first_page=1, last_page=PDF_MAX_PAGES)
+    if not images:
+        raise ValueError("Could not convert PDF to image")
+    
+    if len(images) == 1:
+        return images[0]
+    
+    # Multiple pages, combine them
+    total_height = sum(img.height for img in images)
+    max_width = max(img.width for img in images)
+    combined = Image.new('RGB', (max_width, total_height), color='white')
+    
+    y_offset = 0
+    for img in images:
+        combined.paste(img, (0, y_offset))
+        y_offset += img.height
+    
+    return combined
+
+
+def _pdf_to_png(pdf_data: BytesLike) -> bytes:
+    """
+    Rasterize a PDF with _pdf_to_image and encode the result as PNG.
+    
+    Args:
+        pdf_data: Binary PDF data
+        
+    Returns:
+        PNG image bytes
+    """
+    import io
+    
+    img_byte_arr = io.BytesIO()
+    _pdf_to_image(pdf_data).save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+
+async def _run_pdf_worker(func, pdf_data: BytesLike):
+    """
+    Run _pdf_to_image or _pdf_to_png in a worker thread that never outlives the call.
+    
+    Cancellation is held back until the thread is done, so callers can
+    release pdf_data (e.g. close an upload mmap) as soon as this returns or raises.
+    
+    Args:
+        func: Blocking rasterizer to run
+        pdf_data: Binary PDF data
+        
+    Returns:
+        Whatever func returns
+    """
+    worker = asyncio.ensure_future(asyncio.to_thread(func, pdf_data))
+    try:
+        return await asyncio.shield(worker)
+    except asyncio.CancelledError:
+        while not worker.done():
+            try:
+                await asyncio.wait([worker])
+            except asyncio.CancelledError:
+                pass
+        # Mark any worker error as retrieved; the cancellation wins
+        worker.exception()
+        raise
+
+
+# Regexes compiled once at import instead of on every Gemini response
+# JSON block in the response (may be wrapped in markdown code blocks)
+_JSON_BLOCK_PATTERNS = (
+    re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL),  # JSON in markdown code block
+    re.compile(r'```\s*(\{.*?\})\s*```', re.DOTALL),       # JSON in code block
+    re.compile(r'(\{.*\})', re.DOTALL),                    # Any JSON object (supports nested with DOTALL)
+)
+
+# Key-value pairs used when the response is not valid JSON
+_FALLBACK_FIELD_PATTERNS = {
+    "cuit_librador": re.compile(r'["\']?cuit_librador["\']?\s*[:=]\s*["\']?([^"\',}\]]+)["\']?', re.IGNORECASE),
+    "banco": re.compile(r'["\']?banco["\']?\s*[:=]\s*["\']?([^"\',}\]]+)["\']?', re.IGNORECASE),
+    "importe": re.compile(r'["\']?importe["\']?\s*[:=]\s*([0-9.]+)', re.IGNORECASE),
+    "numero_cheque": re.compile(r'["\']?numero_cheque["\']?\s*[:=]\s*["\']?([^"\',}\]]+)["\']?', re.IGNORECASE),
+}
+
+# Generation parameters shared by every extraction call
+GENERATION_CONFIG = {
+    "temperature": 0.1,  # Lower temperature for more consistent extraction
+    "top_p": 0.95,
+    "top_k": 40,
+}
+
+# Prompts are module constants so every request sends a byte-identical prefix
+# Default prompt with reasoning instructions
+DEFAULT_EXTRACTION_PROMPT = """
+            Analiza esta imagen de manera inteligente y razona sobre su contenido.
+            
+            INSTRUCCIONES:
+            1. Primero, identifica el TIPO de documento (cheque, factura, recibo, etc.)
+            2. Analiza la ESTRUCTURA del documento para entender dónde está cada información
+            3. Extrae la información relevante razonando sobre el contexto
+            
+            Si es un CHEQUE ARGENTINO, identifica y razona sobre:
+            - CUIT del librador: Busca en la sección del librador, puede estar en formato XX-XXXXXXXX-X o sin guiones
+            - Banco: Identifica el nombre del banco emisor (puede estar en el logo o texto)
+            - Fecha de emisión: Busca la fecha donde dice "fecha" o "emisión"
+            - Fecha de pago/vencimiento: Busca donde dice "pagar a" o "vencimiento"
+            - Importe: Busca el monto en números y también en letras para validar
+            - Número de cheque: Busca el número único del cheque
+            - CBU/CUIT beneficiario: Si aparece en el cheque
+            
+            RAZONAMIENTO:
+            - Si un campo no está claro, razona sobre dónde debería estar según la estructura típica de cheques argentinos
+            - Valida que los datos sean consistentes (ej: el importe en números debe coincidir con el de letras)
+            - Si hay ambigüedad, indica tu razonamiento
+            
+            Responde en formato JSON estructurado con los campos extraídos.
+            """
+
+CHEQUE_EXTRACTION_PROMPT = """
+Analiza esta imagen de cheques argentinos y extrae TODOS los cheques encontrados.
+
+RESPONDE ÚNICAMENTE CON ESTE JSON (sin texto adicional, sin markdown, sin explicaciones):
+
+{
+  "cheques": [
+    {
+      "cuit_librador": "30-69163759-6",
+      "banco": "BANCO CREDICOOP",
+      "fecha_emision": "2025-03-14",
+      "fecha_pago": "2025-03-31",
+      "importe": 1000000.00,
+      "numero_cheque": "59503890",
+      "cbu_beneficiario": null
+    }
+  ]
+}
+
+INSTRUCCIONES:
+- Si hay múltiples cheques, agrega más objetos al array "cheques"
+- cuit_librador: formato XX-XXXXXXXX-X (normaliza si viene sin guiones)
+- banco: nombre completo del banco
+- fecha_emision: formato YYYY-MM-DD (convierte "14 de marzo de 2025" a "2025-03-14")
+- fecha_pago: formato YYYY-MM-DD
+- importe: número decimal (ej: 1000000.00, 516099.40)
+- numero_cheque: string con el número
+- cbu_beneficiario: string o null
+
+IMPORTANTE: Responde SOLO con el JSON, nada más.
+        """
+
 
 class GeminiClient:
     """Client for interacting with Gemini 2.5 LLM (with vision) for intelligent document processing."""
@@ -27,11 +209,13 @@ class GeminiClient:
         model_to_use = model_name or settings.gemini_model
         self.model = genai.GenerativeModel(model_to_use)
         self.model_name = model_to_use
+        # Response cache: hash of contents + prompt -> result
+        self._cache = TTLCache(settings.gemini_cache_ttl, settings.gemini_cache_maxsize)
         logger.info(f"Gemini 2.5 client initialized with model: {model_to_use}")
     
     async def process_image(
         self, 
-        image_data: bytes, 
+        image_data: BytesLike, 
         mime_type: str = "image/jpeg",
         prompt: Optional[str] = None
     ) -> Dict[str, Any]:
@@ -39,6 +223,9 @@ class GeminiClient:
         Process an image using Gemini LLM with vision capabilities.
         Uses advanced reasoning to understand document structure and context.
         
+        Successful results are cached by file contents and prompt for
+        `gemini_cache_ttl` seconds, so re-sent documents skip the Gemini call.
+        
         Args:
             image_data: Binary image data
             mime_type: MIME type of the image
@@ -47,34 +234,39 @@ class GeminiClient:
         Returns:
             Dictionary with extracted data
         """
-        try:
-            # Default prompt with reasoning instructions
-            default_prompt = """
-            Analiza esta imagen de manera inteligente y razona sobre su contenido.
-            
-            INSTRUCCIONES:
-            1. Primero, identifica el TIPO de documento (cheque, factura, recibo, etc.)
-            2. Analiza la ESTRUCTURA del documento para entender dónde está cada información
-            3. Extrae la información relevante razonando sobre el contexto
-            
-            Si es un CHEQUE ARGENTINO, identifica y razona sobre:
-            - CUIT del librador: Busca en la sección del librador, puede estar en formato XX-XXXXXXXX-X o sin guiones
-            - Banco: Identifica el nombre del banco emisor (puede estar en el logo o texto)
-            - Fecha de emisión: Busca la fecha donde dice "fecha" o "emisión"
-            - Fecha de pago/vencimiento: Busca donde dice "pagar a" o "vencimiento"
-            - Importe: Busca el monto en números y también en letras para validar
-            - Número de cheque: Busca el número único del cheque
-            - CBU/CUIT beneficiario: Si aparece en el cheque
-            
-            RAZONAMIENTO:
-            - Si un campo no está claro, razona sobre dónde debería estar según la estructura típica de cheques argentinos
-            - Valida que los datos sean consistentes (ej: el importe en números debe coincidir con el de letras)
-            - Si hay ambigüedad, indica tu razonamiento
-            
-            Responde en formato JSON estructurado con los campos extraídos.
-            """
+        extraction_prompt = prompt or DEFAULT_EXTRACTION_PROMPT
+        
+        cache_key = self._cache_key(image_data, mime_type, extraction_prompt)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info("Gemini cache hit for document")
+            return cached
+        
+        result = await self._process_image(image_data, mime_type, extraction_prompt)
+        
+        if result.get("success"):
+            self._cache.set(cache_key, result)
+        
+        return result
+    
+    async def _process_image(
+        self, 
+        image_data: BytesLike, 
+        mime_type: str,
+        extraction_prompt: str
+    ) -> Dict[str, Any]:
+        """
+        Run a Gemini vision call (PDF rasterization and model call), without caching.
+        
+        Args:
+            image_data: Binary image data
+            mime_type: MIME type of the image
+            extraction_prompt: Prompt sent before the image
             
-            extraction_prompt = prompt or default_prompt
+        Returns:
+            Dictionary with extracted data
+        """
+        try:
             
             # Prepare image part - handle both images and PDFs
             import PIL.Image
@@ -82,42 +274,20 @@ class GeminiClient:
             
             # Check if it's a PDF
             if mime_type == "application/pdf":
-                # Convert PDF to image (all pages)
-                from pdf2image import convert_from_bytes
-                from PIL import Image
+                # Convert PDF to image (all pages) off the event loop
                 logger.info("Converting PDF to image (all pages)...")
-                images = convert_from_bytes(image_data, first_page=1, last_page=10)
-                if images:
-                    if len(images) == 1:
-                        image = images[0]
-                        logger.info(f"PDF converted to image: {image.size}")
-                    else:
-                        # Combine multiple pages
-                        total_height = sum(img.height for img in images)
-                        max_width = max(img.width for img in images)
-                        image = Image.new('RGB', (max_width, total_height), color='white')
-                        y_offset = 0
-                        for img in images:
-                            image.paste(img, (0, y_offset))
-                            y_offset += img.height
-                        logger.info(f"PDF converted to combined image ({len(images)} pages): {image.size}")
-                else:
-                    raise ValueError("Could not convert PDF to image")
+                image = await _run_pdf_worker(_pdf_to_image, image_data)
+                logger.info(f"PDF converted to image: {image.size}")
             else:
                 # It's a regular image
                 image = PIL.Image.open(io.BytesIO(image_data))
             
             # Generate content with reasoning
             # Gemini 2.5 supports better structured outputs
-            generation_config = {
-                "temperature": 0.1,  # Lower temperature for more consistent extraction
-                "top_p": 0.95,
-                "top_k": 40,
-            }
-            
-            response = self.model.generate_content(
+            # The prompt goes first so the identical prefix can hit Gemini's implicit cache
+            response = await self._generate_content(
                 [extraction_prompt, image],
-                generation_config=generation_config
+                GENERATION_CONFIG
             )
             
             # Parse response
@@ -141,14 +311,91 @@ class GeminiClient:
                 "error": str(e)
             }
     
+    async def _generate_content(self, contents: list, generation_config: Dict[str, Any]):
+        """
+        Call Gemini with bounded concurrency and exponential backoff on rate limits.
+        
+        Args:
+            contents: Prompt and image parts
+            generation_config: Generation parameters
+            
+        Returns:
+            Gemini response
+        """
+        delay = 1.0
+        for attempt in range(GEMINI_MAX_RETRIES):
+            try:
+                async with _generate_semaphore:
+                    return await self.model.generate_content_async(
+                        contents,
+                        generation_config=generation_config
+                    )
+            except google_exceptions.ResourceExhausted:
+                if attempt == GEMINI_MAX_RETRIES - 1:
+                    raise
+                logger.warning(f"Gemini rate limit reached, retrying in {delay:.0f}s...")
+                await asyncio.sleep(delay)
+                delay *= 2
+    
+    def _cache_key(self, image_data: BytesLike, mime_type: str, prompt: str) -> bytes:
+        """
+        Build the response cache key from the file contents, MIME type, prompt and model.
+        
+        Args:
+            image_data: Binary image data
+            mime_type: MIME type of the image
+            prompt: Extraction prompt (cheque and general results never collide)
+            
+        Returns:
+            16-byte BLAKE2b digest
+        """
+        digest = hashlib.blake2b(image_data, digest_size=16)
+        digest.update(mime_type.encode())
+        digest.update(prompt.encode())
+        digest.update(self.model_name.encode())
+        return digest.digest()
+    
     async def process_cheque(
         self, 
-        image_data: bytes, 
+        image_data: BytesLike, 
         mime_type: str = "image/jpeg"
     ) -> Dict[str, Any]:
         """
         Process a cheque image using advanced reasoning to understand structure and extract data.
         
+        Results with at least one cheque are cached by file contents for
+        `gemini_cache_ttl` seconds, so re-sent cheques skip the Gemini call.
+        Failures and empty extractions are retried on the next request.
+        
+        Args:
+            image_data: Binary image data
+            mime_type: MIME type of the image
+            
+        Returns:
+            Dictionary with structured cheque data (cached dicts are shared
+            between callers: treat them as read-only)
+        """
+        cache_key = self._cache_key(image_data, mime_type, CHEQUE_EXTRACTION_PROMPT)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info("Gemini cache hit for cheque document")
+            return cached
+        
+        result = await self._extract_cheque(image_data, mime_type)
+        
+        if result.get("success") and result.get("cheque_data", {}).get("cheques"):
+            self._cache.set(cache_key, result)
+        
+        return result
+    
+    async def _extract_cheque(
+        self, 
+        image_data: BytesLike, 
+        mime_type: str
+    ) -> Dict[str, Any]:
+        """
+        Run the Gemini cheque extraction (PDF rasterization, model call and JSON parsing).
+        
         Args:
             image_data: Binary image data
             mime_type: MIME type of the image
@@ -156,96 +403,24 @@ class GeminiClient:
         Returns:
             Dictionary with structured cheque data
         """
-        # Handle PDF conversion if needed
+        # Handle PDF conversion if needed (poppler and PNG encoding run in a worker thread)
         if mime_type == "application/pdf":
-            from pdf2image import convert_from_bytes
             logger.info("Converting PDF to image (processing all pages for multiple cheques)...")
-            # Convert all pages (up to 10 pages max to avoid memory issues)
-            images = convert_from_bytes(image_data, first_page=1, last_page=10)
-            if images:
-                # Combine all pages into a single image (vertically stacked)
-                # This allows Gemini to see all cheques at once
-                from PIL import Image
-                import io
-                
-                if len(images) == 1:
-                    # Single page, use it directly
-                    img_byte_arr = io.BytesIO()
-                    images[0].save(img_byte_arr, format='PNG')
-                    image_data = img_byte_arr.getvalue()
-                    logger.info("PDF converted to PNG image (1 page)")
-                else:
-                    # Multiple pages, combine them
-                    total_height = sum(img.height for img in images)
-                    max_width = max(img.width for img in images)
-                    combined = Image.new('RGB', (max_width, total_height), color='white')
-                    
-                    y_offset = 0
-                    for img in images:
-                        combined.paste(img, (0, y_offset))
-                        y_offset += img.height
-                    
-                    img_byte_arr = io.BytesIO()
-                    combined.save(img_byte_arr, format='PNG')
-                    image_data = img_byte_arr.getvalue()
-                    logger.info(f"PDF converted to PNG image ({len(images)} pages combined)")
-                
-                mime_type = "image/png"
-            else:
-                raise ValueError("Could not convert PDF to image")
+            image_data = await _run_pdf_worker(_pdf_to_png, image_data)
+            mime_type = "image/png"
+            logger.info("PDF converted to PNG image")
         
-        cheque_prompt = """
-Analiza esta imagen de cheques argentinos y extrae TODOS los cheques encontrados.
-
-RESPONDE ÚNICAMENTE CON ESTE JSON (sin texto adicional, sin markdown, sin explicaciones):
-
-{
-  "cheques": [
-    {
-      "cuit_librador": "30-69163759-6",
-      "banco": "BANCO CREDICOOP",
-      "fecha_emision": "2025-03-14",
-      "fecha_pago": "2025-03-31",
-      "importe": 1000000.00,
-      "numero_cheque": "59503890",
-      "cbu_beneficiario": null
-    }
-  ]
-}
-
-INSTRUCCIONES:
-- Si hay múltiples cheques, agrega más objetos al array "cheques"
-- cuit_librador: formato XX-XXXXXXXX-X (normaliza si viene sin guiones)
-- banco: nombre completo del banco
-- fecha_emision: formato YYYY-MM-DD (convierte "14 de marzo de 2025" a "2025-03-14")
-- fecha_pago: formato YYYY-MM-DD
-- importe: número decimal (ej: 1000000.00, 516099.40)
-- numero_cheque: string con el número
-- cbu_beneficiario: string o null
-
-IMPORTANTE: Responde SOLO con el JSON, nada más.
-        """
-        
-        result = await self.process_image(image_data, mime_type, cheque_prompt)
+        result = await self._process_image(image_data, mime_type, CHEQUE_EXTRACTION_PROMPT)
         
         # Try to parse JSON from response with improved extraction
-        import json
-        import re
-        
         try:
             # Improved JSON extraction - handles nested objects and arrays
             text = result.get("extracted_text", "").strip()
             
             # Try to find JSON block (may be wrapped in markdown code blocks)
-            json_patterns = [
-                r'```json\s*(\{.*?\})\s*```',  # JSON in markdown code block
-                r'```\s*(\{.*?\})\s*```',       # JSON in code block
-                r'(\{.*\})',                    # Any JSON object (supports nested with DOTALL)
-            ]
-            
             cheque_data = {}
-            for pattern in json_patterns:
-                json_match = re.search(pattern, text, re.DOTALL)
+            for pattern in _JSON_BLOCK_PATTERNS:
+                json_match = pattern.search(text)
                 if json_match:
                     try:
                         json_str = json_match.group(1)
@@ -303,19 +478,11 @@ IMPORTANTE: Responde SOLO con el JSON, nada más.
         Fallback method to extract fields if JSON parsing fails.
         Uses regex to find key-value pairs.
         """
-        import re
         fields = {}
         
         # Extract common fields using regex
-        patterns = {
-            "cuit_librador": r'["\']?cuit_librador["\']?\s*[:=]\s*["\']?([^"\',}\]]+)["\']?',
-            "banco": r'["\']?banco["\']?\s*[:=]\s*["\']?([^"\',}\]]+)["\']?',
-            "importe": r'["\']?importe["\']?\s*[:=]\s*([0-9.]+)',
-            "numero_cheque": r'["\']?numero_cheque["\']?\s*[:=]\s*["\']?([^"\',}\]]+)["\']?',
-        }
-        
-        for field, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
+        for field, pattern in _FALLBACK_FIELD_PATTERNS.items():
+            match = pattern.search(text)
             if match:
                 fields[field] = match.group(1).strip()
         
@@ -0,0 +1,60 @@
+"""
+In-process response cache shared by the API clients.
+"""
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """LRU cache whose entries expire a fixed number of seconds after being stored."""
+    
+    def __init__(self, ttl: float, maxsize: int):
+        """
+        Initialize the cache.
+        
+        Args:
+            ttl: Seconds an entry stays valid (0 disables the cache)
+            maxsize: Maximum number of entries (0 disables the cache)
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # key -> (expires_at, value); dict order doubles as LRU order
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a cached value if it has not expired.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Cached value or None
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            return None
+        
+        # Re-insert to keep most recently used entries last
+        self._entries[key] = entry
+        return value
+    
+    def set(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entry if full.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        
+        self._entries.pop(key, None)
+        while len(self._entries) >= self.maxsize:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + self.ttl, value)
@@ -2,78 +2,48 @@
 File utility functions for handling uploads and file operations.
 """
 import logging
-from typing import Optional
+import mmap
+from typing import Optional, Union
 from pathlib import Path
-from src.app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# File contents as passed between layers: Telegram downloads arrive as bytearray
+# and large uploads as an mmap, so the data is never copied into bytes
+BytesLike = Union[bytes, bytearray, memoryview, mmap.mmap]
 
-def ensure_upload_dir() -> Path:
-    """
-    Ensure upload directory exists.
-    
-    Returns:
-        Path to upload directory
-    """
-    upload_path = Path(settings.upload_dir)
-    upload_path.mkdir(parents=True, exist_ok=True)
-    return upload_path
+# Magic numbers of the formats we can process (prefix -> MIME type)
+MAGIC_SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
 
 
-def save_uploaded_file(
-    file_data: bytes, 
-    filename: str, 
-    subdirectory: Optional[str] = None
-) -> Path:
+def detect_mime_type(file_data: BytesLike) -> Optional[str]:
     """
-    Save uploaded file to disk.
+    Detect MIME type from the file's magic bytes.
     
     Args:
-        file_data: Binary file data
-        filename: Original filename
-        subdirectory: Optional subdirectory within uploads
+        file_data: Binary file data (only the first 16 bytes are inspected)
         
     Returns:
-        Path to saved file
-    """
-    upload_dir = ensure_upload_dir()
-    
-    if subdirectory:
-        upload_dir = upload_dir / subdirectory
-        upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_path = upload_dir / filename
-    
-    with open(file_path, 'wb') as f:
-        f.write(file_data)
-    
-    logger.info(f"File saved: {file_path}")
-    return file_path
-
-
-def get_file_mime_type(filename: str) -> str:
+        MIME type string, or None if the format is not supported
     """
-    Get MIME type from filename extension.
+    header = bytes(file_data[:16])
     
-    Args:
-        filename: Filename with extension
-        
-    Returns:
-        MIME type string
-    """
-    extension = Path(filename).suffix.lower()
+    for signature, mime_type in MAGIC_SIGNATURES:
+        if header.startswith(signature):
+            return mime_type
     
-    mime_types = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.pdf': 'application/pdf',
-        '.webp': 'image/webp'
-    }
+    # WEBP: "RIFF" <size> "WEBP"
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
     
-    return mime_types.get(extension, 'application/octet-stream')
+    return None
 
 
 def is_image_file(filename: str) -> bool: